@@ -14,13 +14,23 @@ import os
 import sys
 import logging
 import atexit
+import json
+import sqlite3
+import time
 
 # Add current directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, session
+from flask import Flask, session, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from datetime import timedelta
 
+# orjson is optional; without it Flask's stdlib json provider is used
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,47 +38,119 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between session last_activity refreshes
+SESSION_TOUCH_INTERVAL = 60
+
+# Endpoints the session timeout check skips (static files and login pages)
+SESSION_EXEMPT_ENDPOINTS = frozenset({
+    'static', 'web.admin_login', 'web.admin_setup', 'web.admin_logout',
+})
+
+
+def _json_bytes(obj):
+    """Serialize obj the way jsonify does (compact, keys in insertion order)"""
+    return json.dumps(obj, separators=(',', ':')).encode() + b'\n'
+
+
+def _json_default(obj):
+    """JSON fallback hook: sqlite3.Row as a dict, else Flask's defaults"""
+    if isinstance(obj, sqlite3.Row):
+        return dict(obj)
+    return DefaultJSONProvider.default(obj)
+
+
+# Constant legacy endpoint bodies, serialized once. Each request still gets
+# its own Response object since the session may add a Set-Cookie header.
+LEGACY_STATE_BODIES = {
+    (success, state): _json_bytes({"success": success, "state": state})
+    for success in (True, False) for state in (True, False)
+}
+LEGACY_INVALID_CHANNEL = _json_bytes({"success": False, "error": "Invalid channel"})
+LEGACY_INVALID_ACTION = _json_bytes({"success": False, "error": "Invalid action"})
+
+
+if orjson is not None:
+    class ORJSONProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by orjson (output matches jsonify's)"""
+
+        def dumps(self, obj, **kwargs):
+            return self._dumpb(obj, kwargs.get('indent')).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            return self._app.response_class(
+                self._dumpb(obj, indent) + b'\n', mimetype=self.mimetype)
+
+        def _dumpb(self, obj, indent=False):
+            option = orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option)
+
 
 def create_app():
     """Create and configure Flask application"""
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.environ.get('PIBOX_SECRET_KEY', 'pibox-secret-key')
-
-    # Session configuration
+    if orjson is not None:
+        app.json = ORJSONProvider(app)
+    # Responses keep dict insertion order; sorting every payload's keys is
+    # wasted work for the JS clients. Output is already compact unless debug.
+    app.json.sort_keys = False
+    # Model rows can be passed to jsonify as-is
+    app.json.default = _json_default
+
+    # Session configuration. Loading config opens the database, which
+    # creates/migrates the schema on the first connection (see get_db).
     from config import config
-    session_timeout = int(config.get('session_timeout', 30))  # Default 30 minutes
-    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=session_timeout)
+    # The last_activity touch below re-issues the cookie often enough; don't
+    # re-sign it on every single request as well.
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = False
 
-    # Initialize database
-    from database.db import init_db, get_db
-    with app.app_context():
-        init_db()
+    # Timeout in seconds, read once here and refreshed by a config watcher
+    # rather than on every request
+    session_settings = {}
+
+    def apply_session_timeout(value):
+        session_timeout = int(value or 30)  # Default 30 minutes
+        app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=session_timeout)
+        session_settings['timeout_secs'] = session_timeout * 60
+
+    apply_session_timeout(config.get('session_timeout', 30))
+    config.watch('session_timeout', apply_session_timeout)
 
     # Session timeout handler
     @app.before_request
     def check_session_timeout():
-        from flask import request
-        from datetime import datetime
-
-        # Skip for static files and login pages
-        if request.endpoint in ['static', 'web.admin_login', 'web.admin_setup', 'web.admin_logout']:
+        if request.endpoint in SESSION_EXEMPT_ENDPOINTS:
             return
 
         # Make session permanent to use PERMANENT_SESSION_LIFETIME
-        session.permanent = True
+        if not session.permanent:
+            session.permanent = True
 
-        # Check last activity
+        # Check last activity (epoch seconds; wall clock since the value
+        # lives in the cookie across restarts)
+        now = time.time()
+        idle_secs = None
         last_activity = session.get('last_activity')
-        if last_activity:
-            last_time = datetime.fromisoformat(last_activity)
-            timeout_minutes = int(config.get('session_timeout', 30))
-            if (datetime.now() - last_time).total_seconds() > timeout_minutes * 60:
+        if isinstance(last_activity, (int, float)):
+            idle_secs = now - last_activity
+            if idle_secs > session_settings['timeout_secs']:
                 session.clear()
                 return
 
-        # Update last activity
-        if session.get('admin_logged_in'):
-            session['last_activity'] = datetime.now().isoformat()
+        # Update last activity. Throttled: every write re-signs the session
+        # cookie, and minute resolution is plenty for a 30-minute timeout.
+        if session.get('admin_logged_in') and (
+                idle_secs is None or idle_secs >= SESSION_TOUCH_INTERVAL):
+            session['last_activity'] = now
 
     # Register blueprints
     from routes import anpr_bp, api_bp, web_bp
@@ -77,46 +159,52 @@ def create_app():
     app.register_blueprint(web_bp)
 
     # Legacy relay endpoints (for backwards compatibility)
+    from services.relay_service import relay_service
+
+    # Serialized /api/status body, keyed on the relay state snapshot it was
+    # built from. relay_service replaces that snapshot on every state or name
+    # change (whoever makes it), so a new snapshot means a stale body.
+    status_cache = {'states': None, 'body': None}
+
+    def json_response(body, status=200):
+        return app.response_class(body, status=status, mimetype='application/json')
+
     @app.route('/api/status')
     def legacy_status():
-        from services.relay_service import relay_service
-        from flask import jsonify
-        return jsonify(relay_service.get_all_states())
+        states = relay_service.get_all_states()
+        if states is not status_cache['states']:
+            status_cache['body'] = jsonify(states).get_data()
+            status_cache['states'] = states
+        return json_response(status_cache['body'])
 
     @app.route('/api/relay/<int:channel>/<action>', methods=['POST', 'GET'])
     def legacy_relay(channel, action):
-        from services.relay_service import relay_service
-        from flask import jsonify, request
-
         if channel < 1 or channel > 8:
-            return jsonify({"success": False, "error": "Invalid channel"}), 400
+            return json_response(LEGACY_INVALID_CHANNEL, 400)
 
         if action == "on":
             success = relay_service.set_relay(channel, True)
-            return jsonify({"success": success, "state": True})
+            return json_response(LEGACY_STATE_BODIES[(bool(success), True)])
         elif action == "off":
             success = relay_service.set_relay(channel, False)
-            return jsonify({"success": success, "state": False})
+            return json_response(LEGACY_STATE_BODIES[(bool(success), False)])
         elif action == "pulse":
             duration = request.args.get('duration', 1.0, type=float)
             success = relay_service.pulse_relay(channel, duration)
             return jsonify({"success": success, "state": "pulsing", "duration": duration})
         else:
-            return jsonify({"success": False, "error": "Invalid action"}), 400
+            return json_response(LEGACY_INVALID_ACTION, 400)
 
     @app.route('/api/all/<action>', methods=['POST'])
     def legacy_all(action):
-        from services.relay_service import relay_service
-        from flask import jsonify
-
         if action == "on":
             relay_service.all_on()
-            return jsonify({"success": True, "state": True})
+            return json_response(LEGACY_STATE_BODIES[(True, True)])
         elif action == "off":
             relay_service.all_off()
-            return jsonify({"success": True, "state": False})
+            return json_response(LEGACY_STATE_BODIES[(True, False)])
         else:
-            return jsonify({"success": False, "error": "Invalid action"}), 400
+            return json_response(LEGACY_INVALID_ACTION, 400)
 
     return app
 
@@ -129,8 +217,15 @@ def start_services():
     from services.cleanup_service import cleanup_service
     from services.lpr_service import lpr_service
     from services.anpr_manager import anpr_manager
+    from database.log_writer import access_log_writer
+    from database.heartbeat_writer import heartbeat_writer
     from config import config
 
+    # Start batched access log and heartbeat writers before anything can
+    # produce events
+    access_log_writer.start()
+    heartbeat_writer.start()
+
     # Initialize GPIO
     if not relay_service.init_gpio():
         logger.warning("GPIO initialization failed - running in simulation mode")
@@ -164,6 +259,8 @@ def stop_services():
     from services.websocket_service import websocket_service
     from services.cleanup_service import cleanup_service
     from services.anpr_manager import anpr_manager
+    from database.log_writer import access_log_writer
+    from database.heartbeat_writer import heartbeat_writer
 
     logger.info("Stopping services...")
 
@@ -172,13 +269,36 @@ def stop_services():
     sync_service.stop_sync_loop()
     websocket_service.stop()
     relay_service.cleanup()
+    # Last, so events from the services above are flushed
+    access_log_writer.stop()
+    heartbeat_writer.stop()
 
     logger.info("All services stopped")
 
 
+def serve(app, port, threads):
+    """
+    Run the WSGI server.
+
+    Prefers waitress: a single asyncore loop multiplexes socket I/O and a
+    fixed pool of worker threads runs the handlers, instead of Flask's dev
+    server spawning a fresh thread per connection. Falls back to the dev
+    server when waitress isn't installed (e.g. on a dev laptop).
+    """
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        logger.warning("waitress not available - using Flask development server")
+        app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+        return
+
+    waitress_serve(app, host='0.0.0.0', port=port, threads=threads,
+                   ident='PiBox')
+
+
 def main():
     """Main entry point"""
-    from config import HTTP_PORT, DATA_DIR, IMAGES_DIR
+    from config import HTTP_PORT, HTTP_THREADS, DATA_DIR, IMAGES_DIR
 
     # Create data directories
     os.makedirs(DATA_DIR, exist_ok=True)
@@ -198,7 +318,7 @@ def main():
     logger.info(f"WebSocket server on ws://0.0.0.0:8081")
 
     try:
-        app.run(host='0.0.0.0', port=HTTP_PORT, debug=False, threaded=True)
+        serve(app, HTTP_PORT, HTTP_THREADS)
     except KeyboardInterrupt:
         logger.info("Shutting down...")
 
@@ -2,6 +2,9 @@
 PiBox Configuration Management
 """
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -46,6 +49,9 @@ IMAGES_DIR = os.path.join(DATA_DIR, 'images')
 HTTP_PORT = int(os.environ.get('PIBOX_HTTP_PORT', 8080))
 WS_PORT = int(os.environ.get('PIBOX_WS_PORT', 8081))
 
+# HTTP worker threads (waitress)
+HTTP_THREADS = int(os.environ.get('PIBOX_HTTP_THREADS', 8))
+
 # GPIO Configuration - BCM pin numbers for 8 relay channels
 RELAY_PINS = {
     1: 5,
@@ -89,6 +95,10 @@ DEFAULTS = {
     'web_relay_password': '12345678', # Web auth password
     'web_relay_pulse_time': '1.0',    # Pulse time in seconds (configured on board)
 
+    # Hikvision feed: read the plate from anpr.xml by child position when no
+    # licensePlate element is found (very old firmware only)
+    'hikvision_index_fallback': 'false',
+
     # Local ANPR (fast-plate-ocr + open-image-models, CPU-only)
     'lpr_enabled': 'false',                                       # Master switch
     'lpr_detector_model': 'yolo-v9-t-384-license-plate-end2end',  # open-image-models hub id
@@ -101,6 +111,7 @@ class Config:
 
     _instance = None
     _cache = {}
+    _watchers = {}
 
     def __new__(cls):
         if cls._instance is None:
@@ -112,7 +123,7 @@ class Config:
             self._load_from_db()
 
     def _load_from_db(self):
-        """Load config from database"""
+        """Load config from database, persisting any missing defaults"""
         try:
             from database.db import get_db
             db = get_db()
@@ -121,12 +132,23 @@ class Config:
                 self._cache[row['key']] = row['value']
         except Exception:
             # Database might not exist yet
-            pass
+            db = None
 
         # Apply defaults for missing keys
-        for key, value in DEFAULTS.items():
-            if key not in self._cache:
-                self._cache[key] = value
+        missing = [(key, DEFAULTS[key]) for key in DEFAULTS.keys() - self._cache.keys()]
+        for key, value in missing:
+            self._cache[key] = value
+
+        # Write them back in one statement/commit rather than one per key
+        if missing and db is not None:
+            try:
+                db.executemany(
+                    'INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)',
+                    missing
+                )
+                db.commit()
+            except Exception:
+                pass
 
     def get(self, key, default=None):
         """Get config value"""
@@ -142,6 +164,7 @@ class Config:
         )
         db.commit()
         self._cache[key] = str(value)
+        self._notify((key,))
 
     def get_all(self):
         """Get all config as dict"""
@@ -151,18 +174,33 @@ class Config:
         """Set multiple config values"""
         from database.db import get_db
         db = get_db()
-        for key, value in data.items():
-            db.execute(
-                'INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)',
-                (key, str(value))
-            )
-            self._cache[key] = str(value)
+        rows = [(key, str(value)) for key, value in data.items()]
+        db.executemany(
+            'INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)',
+            rows
+        )
         db.commit()
+        self._cache.update(rows)
+        self._notify(data.keys())
+
+    def watch(self, key, callback):
+        """Call callback(value) whenever key is changed through this object"""
+        self._watchers.setdefault(key, []).append(callback)
+
+    def _notify(self, keys):
+        """Run watchers registered for any of keys"""
+        for key in keys:
+            for callback in self._watchers.get(key, ()):
+                try:
+                    callback(self._cache.get(key))
+                except Exception as e:
+                    logger.error(f"Config watcher for {key} failed: {e}")
 
     def clear_cache(self):
         """Clear cache and reload from database"""
         self._cache.clear()
         self._load_from_db()
+        self._notify(list(self._watchers))
 
     # Properties for common config values
     @property
@@ -1,13 +1,36 @@
 """
 SQLite Database Connection Manager
 """
+import atexit
 import sqlite3
 import os
+import threading
+import weakref
 from contextlib import contextmanager
 
 # Will be set from config
 DB_PATH = None
-_connection = None
+
+# One connection per thread: with WAL, readers on different threads no
+# longer queue behind a single shared handle's mutex
+_local = threading.local()
+# Every connection handed out, so they can all be closed at exit
+_connections = weakref.WeakSet()
+
+_init_lock = threading.Lock()
+_initialized = False
+
+# Stored in PRAGMA user_version once the schema below has been applied.
+# Bump whenever _create_schema changes so existing databases migrate.
+SCHEMA_VERSION = 5
+
+# Prepared statements kept per connection (sqlite3 default is 128); the
+# access log filters alone produce a few dozen distinct query strings
+STATEMENT_CACHE_SIZE = 256
+
+
+class _Connection(sqlite3.Connection):
+    """sqlite3.Connection that can be weakly referenced"""
 
 
 def get_db_path():
@@ -18,31 +41,88 @@ def get_db_path():
     return DB_PATH
 
 
+# Applied to every new connection.
+# WAL lets readers run alongside the writer, and with synchronous=NORMAL a
+# commit appends to the WAL without an fsync (the WAL is synced at
+# checkpoint). A power cut can lose the last few commits but cannot corrupt
+# the database - an acceptable trade for SD-card write latency.
+CONNECTION_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'mmap_size=134217728',   # 128 MB
+    'cache_size=-20000',     # ~20 MB page cache
+    'busy_timeout=5000',
+)
+
+
+def _configure_connection(conn):
+    """Apply per-connection PRAGMAs"""
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma}')
+
+
 def get_db():
-    """Get database connection (creates if needed)"""
-    global _connection
-    if _connection is None:
+    """Get the calling thread's database connection (creates if needed)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
         db_path = get_db_path()
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        _connection = sqlite3.connect(db_path, check_same_thread=False)
-        _connection.row_factory = sqlite3.Row
-        init_db(_connection)
-    return _connection
+        # check_same_thread=False only so close_all_db() can close it at exit
+        conn = sqlite3.connect(db_path, check_same_thread=False, factory=_Connection,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        _configure_connection(conn)
+        _local.conn = conn
+        _connections.add(conn)
+        # Schema setup happens here, on the first connection of the process;
+        # no separate init_db() call is needed at startup
+        if not _initialized:
+            init_db(conn)
+    return conn
 
 
 def close_db():
-    """Close database connection"""
-    global _connection
-    if _connection:
-        _connection.close()
-        _connection = None
+    """Close the calling thread's database connection"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        _connections.discard(conn)
+        conn.close()
+
+
+@atexit.register
+def close_all_db():
+    """Close every open connection (all threads)"""
+    _local.conn = None
+    for conn in list(_connections):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _connections.clear()
 
 
 def init_db(conn=None):
-    """Initialize database schema"""
+    """Initialize database schema (runs once per process)"""
+    global _initialized
+    if _initialized:
+        return
     if conn is None:
         conn = get_db()
 
+    with _init_lock:
+        if not _initialized:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < SCHEMA_VERSION:
+                _create_schema(conn)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                conn.commit()
+            _initialized = True
+
+
+def _create_schema(conn):
+    """Create tables and indexes, and apply column migrations"""
     cursor = conn.cursor()
 
     # Config table
@@ -71,6 +151,8 @@ def init_db(conn=None):
     ''')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_plate ON vehicles(plate)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_active ON vehicles(active)')
+    # Case-insensitive plate lookups (plate = ? COLLATE NOCASE, prefix LIKE)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_vehicles_plate_nocase ON vehicles(plate COLLATE NOCASE)')
 
     # Barrier mapping table (LOCAL config)
     cursor.execute('''
@@ -86,6 +168,10 @@ def init_db(conn=None):
         )
     ''')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_camera_ip ON barrier_mapping(camera_ip)')
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_barrier_camera_ip_active ON barrier_mapping(camera_ip) '
+        'WHERE active = 1'
+    )
 
     # Access logs table
     cursor.execute('''
@@ -107,17 +193,28 @@ def init_db(conn=None):
         )
     ''')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_timestamp ON access_logs(timestamp)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_synced ON access_logs(odoo_synced)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_plate_nocase ON access_logs(plate COLLATE NOCASE)')
+    # Recent logs filtered by type, walked in timestamp order for LIMIT
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_vtype_ts ON access_logs(vehicle_type, timestamp)')
+    # Only the (few) rows still waiting for Odoo, in get_unsynced order
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_logs_odoo_unsynced ON access_logs(timestamp) '
+        'WHERE odoo_synced = 0'
+    )
+    # Superseded by idx_logs_odoo_unsynced; a low-cardinality flag index only
+    # tempted the planner into sorting
+    cursor.execute('DROP INDEX IF EXISTS idx_log_synced')
 
-    # Migration: Add camera_name and relay_triggered columns if not exist
-    try:
-        cursor.execute('ALTER TABLE access_logs ADD COLUMN camera_name TEXT')
-    except:
-        pass
-    try:
-        cursor.execute('ALTER TABLE access_logs ADD COLUMN relay_triggered TEXT')
-    except:
-        pass
+    # Migration: Add camera_name and relay_triggered columns if not exist,
+    # plus log_date (the YYYY-MM-DD part of timestamp) so per-day filters can
+    # use an index instead of evaluating date(timestamp) on every row
+    _add_missing_columns(cursor, 'access_logs', (
+        ('camera_name', 'TEXT'),
+        ('relay_triggered', 'TEXT'),
+        ('log_date', 'TEXT GENERATED ALWAYS AS (substr(timestamp, 1, 10)) VIRTUAL'),
+    ))
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_date ON access_logs(log_date)')
+    _create_access_log_fts(cursor)
 
     # Locations table (synced from Odoo site.location)
     cursor.execute('''
@@ -158,47 +255,34 @@ def init_db(conn=None):
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_anpr_active ON anpr_cameras(active)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_anpr_reg_code ON anpr_cameras(reg_code)')
 
-    # Migration: Add relay_channels column if not exists
-    try:
-        cursor.execute('ALTER TABLE anpr_cameras ADD COLUMN relay_channels TEXT')
-    except:
-        pass  # Column already exists
-
-    # Migration: Add last_heartbeat column for camera health monitoring
-    try:
-        cursor.execute('ALTER TABLE anpr_cameras ADD COLUMN last_heartbeat TEXT')
-    except:
-        pass  # Column already exists
-
-    # Migration: snapshot (pull) mode — poll an HTTP/RTSP snapshot URL and run ANPR locally
-    for ddl in (
-        'ALTER TABLE anpr_cameras ADD COLUMN snapshot_url TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN snapshot_enabled INTEGER DEFAULT 0',
-        'ALTER TABLE anpr_cameras ADD COLUMN poll_interval_seconds INTEGER DEFAULT 2',
-        'ALTER TABLE anpr_cameras ADD COLUMN min_confidence REAL DEFAULT 0.75',
-        'ALTER TABLE anpr_cameras ADD COLUMN last_captured_plate TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN last_capture_at TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN last_poll_error TEXT',
+    # Migration: relay_channels and last_heartbeat (camera health monitoring),
+    # then snapshot (pull) mode — poll an HTTP/RTSP snapshot URL and run ANPR locally
+    _add_missing_columns(cursor, 'anpr_cameras', (
+        ('relay_channels', 'TEXT'),
+        ('last_heartbeat', 'TEXT'),
+        ('snapshot_url', 'TEXT'),
+        ('snapshot_enabled', 'INTEGER DEFAULT 0'),
+        ('poll_interval_seconds', 'INTEGER DEFAULT 2'),
+        ('min_confidence', 'REAL DEFAULT 0.75'),
+        ('last_captured_plate', 'TEXT'),
+        ('last_capture_at', 'TEXT'),
+        ('last_poll_error', 'TEXT'),
         # Multi-backend ANPR: 'http_push' | 'snapshot' | 'dahua_sdk' | 'hikvision_sdk'
-        "ALTER TABLE anpr_cameras ADD COLUMN feed_mode TEXT DEFAULT 'http_push'",
-        'ALTER TABLE anpr_cameras ADD COLUMN sdk_host TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN sdk_port INTEGER',
-        'ALTER TABLE anpr_cameras ADD COLUMN sdk_username TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN sdk_password TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN feed_enabled INTEGER DEFAULT 0',
+        ('feed_mode', "TEXT DEFAULT 'http_push'"),
+        ('sdk_host', 'TEXT'),
+        ('sdk_port', 'INTEGER'),
+        ('sdk_username', 'TEXT'),
+        ('sdk_password', 'TEXT'),
+        ('feed_enabled', 'INTEGER DEFAULT 0'),
         # RTSP mode — pull frames from an RTSP stream and run local OCR
-        'ALTER TABLE anpr_cameras ADD COLUMN rtsp_url TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN detect_region TEXT',
-        'ALTER TABLE anpr_cameras ADD COLUMN min_read_score REAL DEFAULT 0.8',
-        'ALTER TABLE anpr_cameras ADD COLUMN min_ratio_score REAL DEFAULT 0.85',
-        'ALTER TABLE anpr_cameras ADD COLUMN max_first_detect_seconds INTEGER DEFAULT 3',
-        'ALTER TABLE anpr_cameras ADD COLUMN max_last_detect_seconds INTEGER DEFAULT 5',
-        'ALTER TABLE anpr_cameras ADD COLUMN max_valid_detect_seconds INTEGER DEFAULT 10',
-    ):
-        try:
-            cursor.execute(ddl)
-        except:
-            pass
+        ('rtsp_url', 'TEXT'),
+        ('detect_region', 'TEXT'),
+        ('min_read_score', 'REAL DEFAULT 0.8'),
+        ('min_ratio_score', 'REAL DEFAULT 0.85'),
+        ('max_first_detect_seconds', 'INTEGER DEFAULT 3'),
+        ('max_last_detect_seconds', 'INTEGER DEFAULT 5'),
+        ('max_valid_detect_seconds', 'INTEGER DEFAULT 10'),
+    ))
 
     # Upload queue table (for offline resilience)
     cursor.execute('''
@@ -211,6 +295,15 @@ def init_db(conn=None):
             last_error TEXT
         )
     ''')
+    # Pending items (retries < 5, as in get_pending) in created_at order
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_queue_pending ON upload_queue(created_at) '
+        'WHERE retries < 5'
+    )
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_queue_type_pending ON upload_queue(queue_type, created_at) '
+        'WHERE retries < 5'
+    )
 
     # Audit logs table
     cursor.execute('''
@@ -241,18 +334,90 @@ def init_db(conn=None):
         )
     ''')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_plate ON blacklist(plate)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_plate_nocase ON blacklist(plate COLLATE NOCASE)')
     cursor.execute('CREATE INDEX IF NOT EXISTS idx_blacklist_active ON blacklist(active)')
 
     conn.commit()
 
 
+def _create_access_log_fts(cursor):
+    """
+    Trigram FTS5 index over access_logs plate/camera_name, so the logs page
+    substring search doesn't scan the whole table. Kept in step by triggers.
+    Skipped when the SQLite build lacks FTS5 or the trigram tokenizer
+    (< 3.34); search then falls back to LIKE.
+    """
+    if cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'access_logs_fts'"
+    ).fetchone():
+        return
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE access_logs_fts USING fts5(
+                plate, camera_name,
+                content='access_logs', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS access_logs_fts_ai AFTER INSERT ON access_logs BEGIN
+            INSERT INTO access_logs_fts (rowid, plate, camera_name)
+            VALUES (new.id, new.plate, new.camera_name);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS access_logs_fts_ad AFTER DELETE ON access_logs BEGIN
+            INSERT INTO access_logs_fts (access_logs_fts, rowid, plate, camera_name)
+            VALUES ('delete', old.id, old.plate, old.camera_name);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS access_logs_fts_au AFTER UPDATE OF plate, camera_name ON access_logs BEGIN
+            INSERT INTO access_logs_fts (access_logs_fts, rowid, plate, camera_name)
+            VALUES ('delete', old.id, old.plate, old.camera_name);
+            INSERT INTO access_logs_fts (rowid, plate, camera_name)
+            VALUES (new.id, new.plate, new.camera_name);
+        END
+    ''')
+    # Index rows logged before the table existed
+    cursor.execute("INSERT INTO access_logs_fts (access_logs_fts) VALUES ('rebuild')")
+
+
+def _add_missing_columns(cursor, table, columns):
+    """ALTER TABLE ADD COLUMN for each (name, declaration) not yet in table"""
+    # table_xinfo, unlike table_info, also lists generated columns
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_xinfo({table})')}
+    for name, decl in columns:
+        if name not in existing:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {decl}')
+
+
 @contextmanager
 def db_transaction():
-    """Context manager for database transactions"""
+    """
+    Context manager for database transactions
+    Model writes that end with commit_unless_nested() inside the block are
+    committed together, once, when the outermost block exits.
+    """
     conn = get_db()
+    depth = getattr(_local, 'tx_depth', 0)
+    if depth == 0 and not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    _local.tx_depth = depth + 1
     try:
         yield conn
-        conn.commit()
     except Exception as e:
-        conn.rollback()
+        _local.tx_depth = depth
+        if depth == 0:
+            conn.rollback()
         raise e
+    _local.tx_depth = depth
+    if depth == 0:
+        conn.commit()
+
+
+def commit_unless_nested(conn):
+    """Commit, unless a db_transaction() block will commit for us"""
+    if not getattr(_local, 'tx_depth', 0):
+        conn.commit()
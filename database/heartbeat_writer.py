@@ -0,0 +1,103 @@
+"""
+Deferred anpr_cameras heartbeat writer
+
+Every camera request bumps last_heartbeat. Instead of an UPDATE/commit on
+the request path, the latest timestamp per reg_code is kept in memory and a
+background thread writes them all in one transaction every FLUSH_INTERVAL
+seconds. Repeat heartbeats from a camera within a window collapse into one
+UPDATE.
+
+Until the writer is started, heartbeats are written synchronously.
+"""
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+from .db import get_db, commit_unless_nested
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes
+FLUSH_INTERVAL = 0.5
+
+UPDATE_SQL = 'UPDATE anpr_cameras SET last_heartbeat = ? WHERE reg_code = ?'
+
+
+class HeartbeatWriter:
+    """Write-behind buffer for anpr_cameras.last_heartbeat"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._lock = threading.Lock()
+        # reg_code -> latest heartbeat timestamp not yet written
+        self._pending = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def touch(self, reg_code):
+        """Record a heartbeat for reg_code now"""
+        now = datetime.now().isoformat()
+        if self.running:
+            with self._lock:
+                self._pending[reg_code] = now
+            return
+        self._write([(now, reg_code)])
+
+    def start(self):
+        """Start the flush thread"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='heartbeat-writer', daemon=True)
+        self._thread.start()
+        logger.info("Heartbeat writer started")
+
+    def stop(self):
+        """Write pending heartbeats and stop the thread"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+        self.flush()
+        logger.info("Heartbeat writer stopped")
+
+    def flush(self):
+        """Write all pending heartbeats now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._write([(ts, code) for code, ts in pending.items()])
+
+    def _run(self):
+        while not self._stop_event.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def _write(self, rows):
+        """Apply (timestamp, reg_code) rows in one transaction"""
+        db = get_db()
+        try:
+            db.executemany(UPDATE_SQL, rows)
+            commit_unless_nested(db)
+        except sqlite3.Error as e:
+            db.rollback()
+            logger.error(f"Heartbeat write failed ({len(rows)} cameras): {e}")
+
+
+# Singleton instance
+heartbeat_writer = HeartbeatWriter()
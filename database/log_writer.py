@@ -0,0 +1,203 @@
+"""
+Batched access_logs writer
+
+Plate events queue their access_logs row here instead of committing one
+INSERT each. A background thread flushes the queue with a single
+executemany/commit every FLUSH_INTERVAL seconds (or FLUSH_BATCH rows), so
+a burst of detections costs one SD-card commit instead of one per event.
+
+Row ids are allocated up front, so callers still get the log id back
+immediately. Until the writer is started, rows are written synchronously.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from .db import get_db
+
+logger = logging.getLogger(__name__)
+
+# Flush at least this often (seconds) ...
+FLUSH_INTERVAL = 0.5
+# ... or as soon as this many rows are waiting
+FLUSH_BATCH = 100
+
+INSERT_SQL = '''
+    INSERT INTO access_logs (id, plate, camera_ip, camera_name, relay_triggered,
+                             access_granted, vehicle_type, unit_name, owner_name,
+                             image_path, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+class AccessLogWriter:
+    """Write-behind queue for access_logs inserts"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._pending = set()
+        self._next_id = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._on_commit = []
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _allocate_id(self):
+        """Next access_logs id (caller holds self._cond)"""
+        if self._next_id is None:
+            db = get_db()
+            max_id = db.execute('SELECT MAX(id) FROM access_logs').fetchone()[0] or 0
+            seq = db.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'access_logs'"
+            ).fetchone()
+            self._next_id = max(max_id, seq[0] if seq else 0) + 1
+        log_id = self._next_id
+        self._next_id += 1
+        return log_id
+
+    def add(self, row):
+        """
+        Queue an access_logs row and return its id
+        Args:
+            row: tuple matching INSERT_SQL without the leading id
+        """
+        with self._cond:
+            log_id = self._allocate_id()
+            if self.running:
+                self._pending.add(log_id)
+                self._queue.put((log_id,) + tuple(row))
+                return log_id
+
+        self._write([(log_id,) + tuple(row)])
+        return log_id
+
+    def wait_flushed(self, log_id, timeout=5.0):
+        """Block until log_id has been committed (or timeout)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while log_id in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def flush(self, timeout=5.0):
+        """Block until every queued row has been committed (or timeout)"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def on_commit(self, callback):
+        """Call callback() after each batch of rows is committed"""
+        self._on_commit.append(callback)
+
+    def start(self):
+        """Start the flush thread"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+        self._thread.start()
+        logger.info("Access log writer started")
+
+    def stop(self):
+        """Flush everything queued and stop the thread"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._queue.put(None)  # wake the thread
+        self._thread.join(timeout=10)
+        self._thread = None
+        logger.info("Access log writer stopped")
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    return
+                continue
+
+            batch = [item] if item is not None else []
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < FLUSH_BATCH and not self._stop_event.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is not None:
+                    batch.append(item)
+
+            # On shutdown, take whatever is left in one go
+            if self._stop_event.is_set():
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        batch.append(item)
+
+            if batch:
+                self._write(batch)
+                with self._cond:
+                    self._pending.difference_update(row[0] for row in batch)
+                    self._cond.notify_all()
+
+            if self._stop_event.is_set() and self._queue.empty():
+                return
+
+    def _write(self, rows):
+        """Insert rows in one transaction, falling back to row by row"""
+        db = get_db()
+        try:
+            db.executemany(INSERT_SQL, rows)
+            db.commit()
+        except sqlite3.Error as e:
+            db.rollback()
+            logger.error(f"Batch access log write failed ({len(rows)} rows): {e}")
+
+            for row in rows:
+                try:
+                    db.execute(INSERT_SQL, row)
+                    db.commit()
+                except sqlite3.Error as e:
+                    db.rollback()
+                    logger.error(f"Dropped access log {row[0]} ({row[1]}): {e}")
+
+        for callback in self._on_commit:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Access log commit callback failed: {e}")
+
+
+# Singleton instance
+access_log_writer = AccessLogWriter()
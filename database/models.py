@@ -1,9 +1,291 @@
 """
 Data Access Layer Models
 """
+import base64
 import json
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, date, timedelta
-from .db import get_db
+from .db import get_db, commit_unless_nested
+from .log_writer import access_log_writer
+from .heartbeat_writer import heartbeat_writer
+
+
+# Fixed query variants, keyed by active_only, so each call reuses the same
+# string (and sqlite3 statement cache entry) instead of concatenating one
+_SQL_VEHICLES_ALL = {
+    True: 'SELECT * FROM vehicles WHERE active = 1 ORDER BY plate',
+    False: 'SELECT * FROM vehicles ORDER BY plate',
+}
+_SQL_BARRIERS_ALL = {
+    True: 'SELECT * FROM barrier_mapping WHERE active = 1',
+    False: 'SELECT * FROM barrier_mapping',
+}
+_SQL_LOCATIONS_ALL = {
+    True: 'SELECT * FROM locations WHERE active = 1 ORDER BY name',
+    False: 'SELECT * FROM locations ORDER BY name',
+}
+_SQL_LOCATIONS_BY_SITE = {
+    True: 'SELECT * FROM locations WHERE site_id = ? AND active = 1 ORDER BY name',
+    False: 'SELECT * FROM locations WHERE site_id = ? ORDER BY name',
+}
+_SQL_ANPR_CAMERAS_ALL = {
+    True: 'SELECT * FROM anpr_cameras WHERE active = 1 ORDER BY name',
+    False: 'SELECT * FROM anpr_cameras ORDER BY name',
+}
+_SQL_ANPR_CAMERAS_BY_LOCATION = {
+    True: 'SELECT * FROM anpr_cameras WHERE location_id = ? AND active = 1 ORDER BY name',
+    False: 'SELECT * FROM anpr_cameras WHERE location_id = ? ORDER BY name',
+}
+_SQL_ANPR_CAMERAS_BY_SITE = {
+    True: 'SELECT * FROM anpr_cameras WHERE site_id = ? AND active = 1 ORDER BY name',
+    False: 'SELECT * FROM anpr_cameras WHERE site_id = ? ORDER BY name',
+}
+_SQL_BLACKLIST_ALL = {
+    True: 'SELECT * FROM blacklist WHERE active = 1 ORDER BY added_at DESC',
+    False: 'SELECT * FROM blacklist ORDER BY added_at DESC',
+}
+_SQL_BLACKLIST_COUNT = {
+    True: 'SELECT COUNT(*) as cnt FROM blacklist WHERE active = 1',
+    False: 'SELECT COUNT(*) as cnt FROM blacklist',
+}
+# Stored access_logs columns. Used instead of SELECT * so rows don't carry
+# the virtual log_date column (computed per row) into templates and JSON.
+_ACCESS_LOG_COLUMNS = (
+    'id, plate, camera_ip, camera_name, relay_triggered, timestamp, access_granted, '
+    'vehicle_type, unit_name, owner_name, image_path, s3_url, odoo_synced, odoo_log_id'
+)
+
+_SQL_ACCESS_LOGS_RECENT = (
+    f'SELECT {_ACCESS_LOG_COLUMNS} FROM access_logs ORDER BY timestamp DESC LIMIT ?'
+)
+_SQL_ACCESS_LOGS_RECENT_BY_TYPE = (
+    f'SELECT {_ACCESS_LOG_COLUMNS} FROM access_logs WHERE vehicle_type = ? '
+    'ORDER BY timestamp DESC LIMIT ?'
+)
+_SQL_UPLOAD_QUEUE_PENDING = (
+    'SELECT * FROM upload_queue WHERE retries < 5 ORDER BY created_at LIMIT ?'
+)
+_SQL_UPLOAD_QUEUE_PENDING_BY_TYPE = (
+    'SELECT * FROM upload_queue WHERE retries < 5 AND queue_type = ? ORDER BY created_at LIMIT ?'
+)
+
+# Odoo sync upserts (one executemany per sync)
+_SQL_VEHICLES_UPSERT = '''
+    INSERT INTO vehicles (odoo_id, plate, iu_number, unit_id, unit_name,
+                          owner_name, valid_from, valid_to, active, synced_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT(odoo_id) DO UPDATE SET
+        plate = excluded.plate,
+        iu_number = excluded.iu_number,
+        unit_id = excluded.unit_id,
+        unit_name = excluded.unit_name,
+        owner_name = excluded.owner_name,
+        valid_from = excluded.valid_from,
+        valid_to = excluded.valid_to,
+        active = 1,
+        synced_at = excluded.synced_at
+'''
+_SQL_LOCATIONS_UPSERT = '''
+    INSERT INTO locations (odoo_id, site_id, name, code, camera_ip_address,
+                           parent_id, active, synced_at)
+    VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT(odoo_id) DO UPDATE SET
+        site_id = excluded.site_id,
+        name = excluded.name,
+        code = excluded.code,
+        camera_ip_address = excluded.camera_ip_address,
+        parent_id = excluded.parent_id,
+        active = 1,
+        synced_at = excluded.synced_at
+'''
+_SQL_ANPR_CAMERAS_UPSERT = '''
+    INSERT INTO anpr_cameras (odoo_id, location_id, site_id, name, reg_code,
+                              reg_password, active, synced_at)
+    VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT(odoo_id) DO UPDATE SET
+        location_id = excluded.location_id,
+        site_id = excluded.site_id,
+        name = excluded.name,
+        reg_code = excluded.reg_code,
+        reg_password = excluded.reg_password,
+        active = 1,
+        synced_at = excluded.synced_at
+'''
+
+# plate is UNIQUE and always stored upper-cased, so a re-add of the same
+# plate (in any case) refreshes the existing entry
+_SQL_BLACKLIST_UPSERT = '''
+    INSERT INTO blacklist (plate, reason, added_by, added_at, expires_at, active)
+    VALUES (?, ?, ?, ?, ?, 1)
+    ON CONFLICT(plate) DO UPDATE SET
+        reason = excluded.reason,
+        added_by = excluded.added_by,
+        added_at = excluded.added_at,
+        expires_at = excluded.expires_at,
+        active = 1
+'''
+
+# Today's dashboard counters are polled by every open page and the websocket
+# stats loop; share one aggregation across them for a few seconds. 'gen' is
+# bumped by AccessLogModel.clear_cache() so a query that raced a write
+# doesn't re-cache stale counts.
+TODAY_STATS_TTL = 10
+_today_stats_cache = {'day': None, 'expires': 0.0, 'stats': None, 'gen': 0}
+
+# ANPR event routes look up the sending camera on every request. Rows are
+# kept CAMERA_CACHE_TTL seconds ({reg_code: (expires_at, row or None)}) and
+# dropped early by AnprCameraModel.clear_cache().
+CAMERA_CACHE_TTL = 60
+CAMERA_CACHE_MAX = 1024
+_camera_by_reg_code = {}
+
+# Today's ISO date, recomputed only once the wall clock passes the next local
+# midnight (vehicle validity is checked on every ANPR event)
+_today = {'iso': None, 'until': 0.0}
+
+
+def _today_iso():
+    """date.today().isoformat(), cached until midnight"""
+    now = time.time()
+    if now >= _today['until'] or _today['iso'] is None:
+        today = date.today()
+        midnight = datetime.combine(today + timedelta(days=1), datetime.min.time())
+        _today['iso'] = today.isoformat()
+        _today['until'] = midnight.timestamp()
+    return _today['iso']
+
+
+def _m2o_id(value):
+    """Id from an Odoo Many2one value ([id, name], or False when unset)"""
+    if isinstance(value, (list, tuple)):
+        return value[0] if value else None
+    if value is False:
+        return None
+    return value
+
+
+def _encode_page_cursor(row):
+    """Opaque keyset cursor for the (timestamp, id) of a log row"""
+    raw = json.dumps([row['timestamp'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_page_cursor(cursor):
+    """(timestamp, id) from _encode_page_cursor output; ValueError if invalid"""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(timestamp), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+
+
+def _page_after(table, columns, where, params, cursor, per_page):
+    """
+    Keyset page of a log table, newest first
+    Rows strictly older than cursor's (timestamp, id) are returned, so the
+    cost no longer grows with page depth the way OFFSET does. The timestamp
+    index serves the order since id is the rowid.
+    Returns:
+        (rows, next_cursor) - next_cursor is None on the last page
+    """
+    if cursor:
+        where += ' AND (timestamp, id) < (?, ?)'
+        params = params + list(_decode_page_cursor(cursor))
+    rows = get_db().execute(
+        f'SELECT {columns} FROM {table}{where} ORDER BY timestamp DESC, id DESC LIMIT ?',
+        params + [per_page]
+    ).fetchall()
+    next_cursor = _encode_page_cursor(rows[-1]) if len(rows) == per_page else None
+    return rows, next_cursor
+
+
+@contextmanager
+def _sync_transaction(db):
+    """Run a bulk write (Odoo sync, batch upsert) as one transaction, taken up front"""
+    if not db.in_transaction:
+        db.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except Exception:
+        db.rollback()
+        raise
+    db.commit()
+
+
+def _parse_relay_channels(value):
+    """relay_channels column (JSON list or bare channel number) as a list"""
+    try:
+        channels = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return [int(value)]
+    return [channels] if isinstance(channels, int) else channels
+
+
+@lru_cache(maxsize=256)
+def _relay_channel_tuple(value):
+    """_parse_relay_channels() as a tuple, memoized on the column text"""
+    return tuple(_parse_relay_channels(value))
+
+
+@lru_cache(maxsize=1)
+def _access_log_fts():
+    """Whether the access_logs_fts search index exists (see db._create_access_log_fts)"""
+    return get_db().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'access_logs_fts'"
+    ).fetchone() is not None
+
+
+@lru_cache(maxsize=64)
+def _relay_csv(channels):
+    """access_logs.relay_triggered text for a channel tuple ('1,2'), or None"""
+    return ','.join(map(str, channels)) if channels else None
+
+
+def _like_contains(term):
+    """LIKE pattern (with ESCAPE '\\') matching term literally as a substring"""
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{term}%'
+
+
+# Camera -> barrier lookups run on every ANPR event for a handful of rows
+# that rarely change, so they are memoized. Every write to barrier_mapping or
+# anpr_cameras.relay_channels must call the owning model's clear_cache().
+
+@lru_cache(maxsize=256)
+def _barrier_by_camera_ip(camera_ip):
+    """(mapping dict or None, relay channel tuple) for a camera IP"""
+    row = get_db().execute(
+        'SELECT * FROM barrier_mapping WHERE camera_ip = ? AND active = 1',
+        (camera_ip,)
+    ).fetchone()
+    if not row:
+        return None, ()
+    return dict(row), _relay_channel_tuple(row['relay_channels'])
+
+
+@lru_cache(maxsize=256)
+def _anpr_relay_channels(reg_code):
+    """Relay channel tuple for an active ANPR camera reg_code"""
+    row = get_db().execute(
+        'SELECT relay_channels FROM anpr_cameras WHERE reg_code = ? AND active = 1',
+        (reg_code,)
+    ).fetchone()
+    if not row or not row['relay_channels']:
+        return ()
+    return _relay_channel_tuple(row['relay_channels'])
+
+
+# The blacklist is checked on every ANPR event and changes only through
+# BlacklistModel, whose writers call BlacklistModel.clear_cache().
+
+@lru_cache(maxsize=1)
+def _active_blacklist():
+    """{upper-cased plate: expires_at or None} for active blacklist entries"""
+    rows = get_db().execute('SELECT plate, expires_at FROM blacklist WHERE active = 1')
+    return {row['plate'].upper(): row['expires_at'] for row in rows}
 
 
 class VehicleModel:
@@ -13,18 +295,14 @@ class VehicleModel:
     def get_all(active_only=True):
         """Get all vehicles"""
         db = get_db()
-        query = 'SELECT * FROM vehicles'
-        if active_only:
-            query += ' WHERE active = 1'
-        query += ' ORDER BY plate'
-        return db.execute(query).fetchall()
+        return db.execute(_SQL_VEHICLES_ALL[bool(active_only)]).fetchall()
 
     @staticmethod
     def get_by_plate(plate):
         """Get vehicle by plate number (case-insensitive)"""
         db = get_db()
         return db.execute(
-            'SELECT * FROM vehicles WHERE UPPER(plate) = UPPER(?) AND active = 1',
+            'SELECT * FROM vehicles WHERE plate = ? COLLATE NOCASE AND active = 1',
             (plate,)
         ).fetchone()
 
@@ -33,7 +311,7 @@ class VehicleModel:
         """Search vehicles by plate"""
         db = get_db()
         return db.execute(
-            'SELECT * FROM vehicles WHERE UPPER(plate) LIKE UPPER(?) AND active = 1 ORDER BY plate LIMIT ?',
+            'SELECT * FROM vehicles WHERE plate LIKE ? AND active = 1 ORDER BY plate LIMIT ?',
             (f'%{query}%', limit)
         ).fetchall()
 
@@ -43,7 +321,7 @@ class VehicleModel:
         db = get_db()
         if search:
             result = db.execute(
-                'SELECT COUNT(*) as cnt FROM vehicles WHERE active = 1 AND UPPER(plate) LIKE UPPER(?)',
+                'SELECT COUNT(*) as cnt FROM vehicles WHERE active = 1 AND plate LIKE ?',
                 (f'%{search}%',)
             ).fetchone()
         else:
@@ -58,7 +336,7 @@ class VehicleModel:
 
         if search:
             return db.execute(
-                'SELECT * FROM vehicles WHERE active = 1 AND UPPER(plate) LIKE UPPER(?) ORDER BY plate LIMIT ? OFFSET ?',
+                'SELECT * FROM vehicles WHERE active = 1 AND plate LIKE ? ORDER BY plate LIMIT ? OFFSET ?',
                 (f'%{search}%', per_page, offset)
             ).fetchall()
         else:
@@ -67,44 +345,64 @@ class VehicleModel:
                 (per_page, offset)
             ).fetchall()
 
+    @staticmethod
+    def get_page_with_total(page=1, per_page=50, search=None):
+        """
+        One page of active vehicles plus the total matching count, in one query
+        Returns:
+            (rows, total)
+        """
+        db = get_db()
+        offset = (page - 1) * per_page
+
+        if search:
+            rows = db.execute(
+                'SELECT *, COUNT(*) OVER () AS total FROM vehicles WHERE active = 1 AND plate LIKE ? '
+                'ORDER BY plate LIMIT ? OFFSET ?',
+                (f'%{search}%', per_page, offset)
+            ).fetchall()
+        else:
+            rows = db.execute(
+                'SELECT *, COUNT(*) OVER () AS total FROM vehicles WHERE active = 1 '
+                'ORDER BY plate LIMIT ? OFFSET ?',
+                (per_page, offset)
+            ).fetchall()
+        if rows:
+            return rows, rows[0]['total']
+        # Page past the end: the window has no row to report the total on
+        if offset:
+            return rows, VehicleModel.count(search=search)
+        return rows, 0
+
     @staticmethod
     def sync_from_odoo(vehicles):
         """Sync vehicles from Odoo (full replace)"""
         db = get_db()
         now = datetime.now().isoformat()
 
-        # Mark all as inactive first
-        db.execute('UPDATE vehicles SET active = 0')
-
-        # Upsert each vehicle
-        for v in vehicles:
-            db.execute('''
-                INSERT INTO vehicles (odoo_id, plate, iu_number, unit_id, unit_name,
-                                      owner_name, valid_from, valid_to, active, synced_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-                ON CONFLICT(odoo_id) DO UPDATE SET
-                    plate = excluded.plate,
-                    iu_number = excluded.iu_number,
-                    unit_id = excluded.unit_id,
-                    unit_name = excluded.unit_name,
-                    owner_name = excluded.owner_name,
-                    valid_from = excluded.valid_from,
-                    valid_to = excluded.valid_to,
-                    active = 1,
-                    synced_at = excluded.synced_at
-            ''', (
-                v.get('id'),
-                (v.get('plate') or '').upper(),
-                v.get('iu_number') or None,
-                v.get('unit_id'),
-                v.get('unit_name'),
-                v.get('owner_name') or None,
-                v.get('valid_from') or None,
-                v.get('valid_to') or None,
-                now
-            ))
+        rows = ((
+            v.get('id'),
+            (v.get('plate') or '').upper(),
+            v.get('iu_number') or None,
+            v.get('unit_id'),
+            v.get('unit_name'),
+            v.get('owner_name') or None,
+            v.get('valid_from') or None,
+            v.get('valid_to') or None,
+            now
+        ) for v in vehicles)
+
+        with _sync_transaction(db):
+            # Upsert each vehicle
+            db.executemany(_SQL_VEHICLES_UPSERT, rows)
+
+            # Deactivate whatever this sync didn't touch. Only removed rows
+            # are written, instead of resetting every row before the upsert.
+            db.execute(
+                'UPDATE vehicles SET active = 0 WHERE active = 1 AND synced_at IS NOT ?',
+                (now,)
+            )
 
-        db.commit()
         return len(vehicles)
 
     @staticmethod
@@ -115,7 +413,7 @@ class VehicleModel:
         if not vehicle_row['active']:
             return False
 
-        today = date.today().isoformat()
+        today = _today_iso()
 
         valid_from = vehicle_row['valid_from']
         valid_to = vehicle_row['valid_to']
@@ -135,30 +433,24 @@ class BarrierModel:
     def get_all(active_only=True):
         """Get all barrier mappings"""
         db = get_db()
-        query = 'SELECT * FROM barrier_mapping'
-        if active_only:
-            query += ' WHERE active = 1'
-        return db.execute(query).fetchall()
+        return db.execute(_SQL_BARRIERS_ALL[bool(active_only)]).fetchall()
 
     @staticmethod
     def get_by_camera_ip(camera_ip):
-        """Get barrier mapping for a camera IP"""
-        db = get_db()
-        return db.execute(
-            'SELECT * FROM barrier_mapping WHERE camera_ip = ? AND active = 1',
-            (camera_ip,)
-        ).fetchone()
+        """Get barrier mapping for a camera IP (cached, as a dict)"""
+        mapping, _ = _barrier_by_camera_ip(camera_ip)
+        return dict(mapping) if mapping else None
 
     @staticmethod
     def get_relay_channels(camera_ip):
-        """Get relay channels for a camera IP as list"""
-        mapping = BarrierModel.get_by_camera_ip(camera_ip)
-        if mapping:
-            try:
-                return json.loads(mapping['relay_channels'])
-            except (json.JSONDecodeError, TypeError):
-                return [int(mapping['relay_channels'])]
-        return []  # No relay configured - don't trigger for unknown cameras
+        """Get relay channels for a camera IP as list (cached)"""
+        # No relay configured - don't trigger for unknown cameras
+        return list(_barrier_by_camera_ip(camera_ip)[1])
+
+    @staticmethod
+    def clear_cache():
+        """Drop memoized camera IP lookups (call after any write)"""
+        _barrier_by_camera_ip.cache_clear()
 
     @staticmethod
     def create(camera_ip, relay_channels, camera_name=None, direction='both', location_name=None, location_id=None):
@@ -166,12 +458,13 @@ class BarrierModel:
         db = get_db()
         if isinstance(relay_channels, list):
             relay_channels = json.dumps(relay_channels)
-        db.execute('''
+        cursor = db.execute('''
             INSERT INTO barrier_mapping (camera_ip, camera_name, relay_channels, direction, location_name, location_id)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (camera_ip, camera_name, relay_channels, direction, location_name, location_id))
         db.commit()
-        return db.execute('SELECT last_insert_rowid()').fetchone()[0]
+        BarrierModel.clear_cache()
+        return cursor.lastrowid
 
     @staticmethod
     def update(mapping_id, **kwargs):
@@ -191,6 +484,7 @@ class BarrierModel:
             values.append(mapping_id)
             db.execute(f'UPDATE barrier_mapping SET {", ".join(updates)} WHERE id = ?', values)
             db.commit()
+            BarrierModel.clear_cache()
 
     @staticmethod
     def delete(mapping_id):
@@ -198,6 +492,7 @@ class BarrierModel:
         db = get_db()
         db.execute('DELETE FROM barrier_mapping WHERE id = ?', (mapping_id,))
         db.commit()
+        BarrierModel.clear_cache()
 
 
 class AccessLogModel:
@@ -206,57 +501,59 @@ class AccessLogModel:
     @staticmethod
     def create(plate, camera_ip, access_granted, vehicle_type, unit_name=None,
                owner_name=None, image_path=None, camera_name=None, relay_triggered=None):
-        """Create new access log entry"""
-        db = get_db()
+        """Create new access log entry (queued on the batched writer)"""
         # Convert relay list to string if needed
-        if isinstance(relay_triggered, list):
-            relay_triggered = ','.join(str(r) for r in relay_triggered) if relay_triggered else None
-        db.execute('''
-            INSERT INTO access_logs (plate, camera_ip, camera_name, relay_triggered,
-                                     access_granted, vehicle_type, unit_name, owner_name,
-                                     image_path, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (plate, camera_ip, camera_name, relay_triggered,
-              1 if access_granted else 0, vehicle_type, unit_name, owner_name,
-              image_path, datetime.now().isoformat()))
-        db.commit()
-        return db.execute('SELECT last_insert_rowid()').fetchone()[0]
+        if isinstance(relay_triggered, (list, tuple)):
+            relay_triggered = _relay_csv(tuple(relay_triggered))
+        return access_log_writer.add((
+            plate, camera_ip, camera_name, relay_triggered,
+            1 if access_granted else 0, vehicle_type, unit_name, owner_name,
+            image_path, datetime.now().isoformat()
+        ))
 
     @staticmethod
     def get_recent(limit=50, vehicle_type=None):
         """Get recent access logs"""
         db = get_db()
-        query = 'SELECT * FROM access_logs'
-        params = []
         if vehicle_type:
-            query += ' WHERE vehicle_type = ?'
-            params.append(vehicle_type)
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
-        return db.execute(query, params).fetchall()
+            return db.execute(_SQL_ACCESS_LOGS_RECENT_BY_TYPE, (vehicle_type, limit)).fetchall()
+        return db.execute(_SQL_ACCESS_LOGS_RECENT, (limit,)).fetchall()
 
     @staticmethod
-    def count(vehicle_type=None, search=None, date_from=None, date_to=None, access_granted=None):
-        """Count access logs"""
-        db = get_db()
-        query = 'SELECT COUNT(*) as cnt FROM access_logs WHERE 1=1'
+    def _filters(vehicle_type=None, search=None, date_from=None, date_to=None, access_granted=None):
+        """WHERE clause and params shared by count() and the page queries"""
+        query = ' WHERE 1=1'
         params = []
         if vehicle_type:
             query += ' AND vehicle_type = ?'
             params.append(vehicle_type)
         if search:
-            query += ' AND (UPPER(plate) LIKE UPPER(?) OR UPPER(camera_name) LIKE UPPER(?))'
-            params.extend([f'%{search}%', f'%{search}%'])
+            if len(search) >= 3 and _access_log_fts():
+                # Trigram index lookup; a quoted phrase matches substrings
+                query += ' AND id IN (SELECT rowid FROM access_logs_fts WHERE access_logs_fts MATCH ?)'
+                params.append('"' + search.replace('"', '""') + '"')
+            else:
+                # Literal match, like the FTS phrase above
+                query += " AND (plate LIKE ? ESCAPE '\\' OR camera_name LIKE ? ESCAPE '\\')"
+                pattern = _like_contains(search)
+                params.extend([pattern, pattern])
         if date_from:
-            query += ' AND date(timestamp) >= ?'
+            query += ' AND log_date >= ?'
             params.append(date_from)
         if date_to:
-            query += ' AND date(timestamp) <= ?'
+            query += ' AND log_date <= ?'
             params.append(date_to)
         if access_granted is not None:
             query += ' AND access_granted = ?'
             params.append(1 if access_granted else 0)
-        result = db.execute(query, params).fetchone()
+        return query, params
+
+    @staticmethod
+    def count(vehicle_type=None, search=None, date_from=None, date_to=None, access_granted=None):
+        """Count access logs"""
+        db = get_db()
+        where, params = AccessLogModel._filters(vehicle_type, search, date_from, date_to, access_granted)
+        result = db.execute('SELECT COUNT(*) as cnt FROM access_logs' + where, params).fetchone()
         return result['cnt'] if result else 0
 
     @staticmethod
@@ -264,27 +561,44 @@ class AccessLogModel:
         """Get access logs with pagination"""
         db = get_db()
         offset = (page - 1) * per_page
-        query = 'SELECT * FROM access_logs WHERE 1=1'
-        params = []
-        if vehicle_type:
-            query += ' AND vehicle_type = ?'
-            params.append(vehicle_type)
-        if search:
-            query += ' AND (UPPER(plate) LIKE UPPER(?) OR UPPER(camera_name) LIKE UPPER(?))'
-            params.extend([f'%{search}%', f'%{search}%'])
-        if date_from:
-            query += ' AND date(timestamp) >= ?'
-            params.append(date_from)
-        if date_to:
-            query += ' AND date(timestamp) <= ?'
-            params.append(date_to)
-        if access_granted is not None:
-            query += ' AND access_granted = ?'
-            params.append(1 if access_granted else 0)
-        query += ' ORDER BY timestamp DESC LIMIT ? OFFSET ?'
+        where, params = AccessLogModel._filters(vehicle_type, search, date_from, date_to, access_granted)
+        query = (f'SELECT {_ACCESS_LOG_COLUMNS} FROM access_logs' + where +
+                 ' ORDER BY timestamp DESC LIMIT ? OFFSET ?')
         params.extend([per_page, offset])
         return db.execute(query, params).fetchall()
 
+    @staticmethod
+    def get_page_with_total(page=1, per_page=50, vehicle_type=None, search=None, date_from=None, date_to=None, access_granted=None):
+        """
+        One page of access logs plus the total matching count, in one query
+        Returns:
+            (rows, total)
+        """
+        db = get_db()
+        offset = (page - 1) * per_page
+        where, params = AccessLogModel._filters(vehicle_type, search, date_from, date_to, access_granted)
+        query = (f'SELECT {_ACCESS_LOG_COLUMNS}, COUNT(*) OVER () AS total FROM access_logs' + where +
+                 ' ORDER BY timestamp DESC LIMIT ? OFFSET ?')
+        rows = db.execute(query, params + [per_page, offset]).fetchall()
+        if rows:
+            return rows, rows[0]['total']
+        # Page past the end: the window has no row to report the total on
+        if offset:
+            return rows, AccessLogModel.count(vehicle_type, search, date_from, date_to, access_granted)
+        return rows, 0
+
+    @staticmethod
+    def get_page_after(cursor=None, per_page=50, vehicle_type=None, search=None, date_from=None, date_to=None, access_granted=None):
+        """
+        Keyset-paginated access logs, newest first
+        Args:
+            cursor: next_cursor from the previous page (None for the first)
+        Returns:
+            (rows, next_cursor)
+        """
+        where, params = AccessLogModel._filters(vehicle_type, search, date_from, date_to, access_granted)
+        return _page_after('access_logs', _ACCESS_LOG_COLUMNS, where, params, cursor, per_page)
+
     @staticmethod
     def get_stats_by_date_range(date_from, date_to):
         """Get statistics for a date range"""
@@ -298,7 +612,7 @@ class AccessLogModel:
                 SUM(CASE WHEN vehicle_type = 'unknown' THEN 1 ELSE 0 END) as unknown,
                 SUM(CASE WHEN vehicle_type = 'blacklisted' THEN 1 ELSE 0 END) as blacklisted
             FROM access_logs
-            WHERE date(timestamp) >= ? AND date(timestamp) <= ?
+            WHERE log_date >= ? AND log_date <= ?
         ''', (date_from, date_to)).fetchone()
         return {
             'total': result['total'] or 0,
@@ -317,13 +631,13 @@ class AccessLogModel:
             target_date = date.today().isoformat()
         result = db.execute('''
             SELECT
-                strftime('%H', timestamp) as hour,
+                substr(timestamp, 12, 2) as hour,
                 COUNT(*) as total,
                 SUM(CASE WHEN access_granted = 1 THEN 1 ELSE 0 END) as granted,
                 SUM(CASE WHEN access_granted = 0 THEN 1 ELSE 0 END) as denied
             FROM access_logs
-            WHERE date(timestamp) = ?
-            GROUP BY strftime('%H', timestamp)
+            WHERE log_date = ?
+            GROUP BY substr(timestamp, 12, 2)
             ORDER BY hour
         ''', (target_date,)).fetchall()
         return [dict(r) for r in result]
@@ -334,13 +648,13 @@ class AccessLogModel:
         db = get_db()
         result = db.execute('''
             SELECT
-                date(timestamp) as day,
+                log_date as day,
                 COUNT(*) as total,
                 SUM(CASE WHEN access_granted = 1 THEN 1 ELSE 0 END) as granted,
                 SUM(CASE WHEN access_granted = 0 THEN 1 ELSE 0 END) as denied
             FROM access_logs
-            WHERE date(timestamp) >= date('now', ?)
-            GROUP BY date(timestamp)
+            WHERE log_date >= date('now', ?)
+            GROUP BY log_date
             ORDER BY day
         ''', (f'-{days} days',)).fetchall()
         return [dict(r) for r in result]
@@ -356,7 +670,7 @@ class AccessLogModel:
                 SUM(CASE WHEN access_granted = 1 THEN 1 ELSE 0 END) as granted,
                 SUM(CASE WHEN access_granted = 0 THEN 1 ELSE 0 END) as denied
             FROM access_logs
-            WHERE date(timestamp) >= date('now', ?)
+            WHERE log_date >= date('now', ?)
             GROUP BY camera_name
             ORDER BY total DESC
         ''', (f'-{days} days',)).fetchall()
@@ -374,8 +688,8 @@ class AccessLogModel:
                 MAX(unit_name) as unit_name,
                 MAX(owner_name) as owner_name
             FROM access_logs
-            WHERE date(timestamp) >= date('now', ?)
-            GROUP BY UPPER(plate)
+            WHERE log_date >= date('now', ?)
+            GROUP BY plate COLLATE NOCASE
             ORDER BY count DESC
             LIMIT ?
         ''', (f'-{days} days', limit)).fetchall()
@@ -387,11 +701,11 @@ class AccessLogModel:
         db = get_db()
         result = db.execute('''
             SELECT
-                strftime('%H', timestamp) as hour,
+                substr(timestamp, 12, 2) as hour,
                 COUNT(*) as total
             FROM access_logs
-            WHERE date(timestamp) >= date('now', ?)
-            GROUP BY strftime('%H', timestamp)
+            WHERE log_date >= date('now', ?)
+            GROUP BY substr(timestamp, 12, 2)
             ORDER BY total DESC
             LIMIT 5
         ''', (f'-{days} days',)).fetchall()
@@ -401,8 +715,8 @@ class AccessLogModel:
     def get_recent_denied(limit=10):
         """Get recent denied entries"""
         db = get_db()
-        result = db.execute('''
-            SELECT * FROM access_logs
+        result = db.execute(f'''
+            SELECT {_ACCESS_LOG_COLUMNS} FROM access_logs
             WHERE access_granted = 0
             ORDER BY timestamp DESC
             LIMIT ?
@@ -414,32 +728,54 @@ class AccessLogModel:
         """Get logs not yet synced to Odoo"""
         db = get_db()
         return db.execute(
-            'SELECT * FROM access_logs WHERE odoo_synced = 0 ORDER BY timestamp LIMIT ?',
+            f'SELECT {_ACCESS_LOG_COLUMNS} FROM access_logs WHERE odoo_synced = 0 '
+            'ORDER BY timestamp LIMIT ?',
             (limit,)
         ).fetchall()
 
     @staticmethod
     def mark_synced(log_id, odoo_log_id):
         """Mark log as synced to Odoo"""
+        AccessLogModel.mark_synced_many([(log_id, odoo_log_id)])
+
+    @staticmethod
+    def mark_synced_many(pairs):
+        """
+        Mark several logs as synced to Odoo in one transaction
+        Args:
+            pairs: iterable of (log_id, odoo_log_id)
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        # The rows may still be sitting in the writer queue
+        for log_id, _ in pairs:
+            access_log_writer.wait_flushed(log_id)
         db = get_db()
-        db.execute(
+        db.executemany(
             'UPDATE access_logs SET odoo_synced = 1, odoo_log_id = ? WHERE id = ?',
-            (odoo_log_id, log_id)
+            ((odoo_log_id, log_id) for log_id, odoo_log_id in pairs)
         )
         db.commit()
 
     @staticmethod
     def update_s3_url(log_id, s3_url):
         """Update S3 URL after upload"""
+        access_log_writer.wait_flushed(log_id)
         db = get_db()
         db.execute('UPDATE access_logs SET s3_url = ? WHERE id = ?', (s3_url, log_id))
         db.commit()
 
     @staticmethod
     def get_today_stats():
-        """Get today's statistics"""
+        """Get today's statistics (cached for TODAY_STATS_TTL seconds)"""
+        today = _today_iso()
+        cached = _today_stats_cache
+        if cached['day'] == today and time.monotonic() < cached['expires']:
+            return dict(cached['stats'])
+
+        gen = cached['gen']
         db = get_db()
-        today = date.today().isoformat()
         result = db.execute('''
             SELECT
                 COUNT(*) as total,
@@ -448,26 +784,46 @@ class AccessLogModel:
                 SUM(CASE WHEN vehicle_type = 'resident' THEN 1 ELSE 0 END) as residents,
                 SUM(CASE WHEN vehicle_type = 'unknown' THEN 1 ELSE 0 END) as unknown
             FROM access_logs
-            WHERE date(timestamp) = ?
+            WHERE log_date = ?
         ''', (today,)).fetchone()
-        return {
+        stats = {
             'total': result['total'] or 0,
             'granted': result['granted'] or 0,
             'denied': result['denied'] or 0,
             'residents': result['residents'] or 0,
             'unknown': result['unknown'] or 0,
         }
+        if cached['gen'] == gen:
+            _today_stats_cache.update(day=today, expires=time.monotonic() + TODAY_STATS_TTL,
+                                      stats=stats)
+        return dict(stats)
+
+    @staticmethod
+    def clear_cache():
+        """Drop cached today stats (called once queued rows are committed)"""
+        _today_stats_cache['gen'] += 1
+        _today_stats_cache['expires'] = 0.0
 
     @staticmethod
     def get_by_id(log_id):
         """Get log by ID"""
         db = get_db()
-        return db.execute('SELECT * FROM access_logs WHERE id = ?', (log_id,)).fetchone()
+        return db.execute(
+            f'SELECT {_ACCESS_LOG_COLUMNS} FROM access_logs WHERE id = ?', (log_id,)
+        ).fetchone()
+
+
+# Today's counts only change once the batched writer commits the rows
+access_log_writer.on_commit(AccessLogModel.clear_cache)
 
 
 class UploadQueueModel:
     """Data access for upload_queue table"""
 
+    # Set whenever an item is added, so the sync loop can wait on it
+    # instead of polling the table
+    item_added = threading.Event()
+
     @staticmethod
     def add(queue_type, payload):
         """Add item to queue"""
@@ -478,35 +834,45 @@ class UploadQueueModel:
             'INSERT INTO upload_queue (queue_type, payload) VALUES (?, ?)',
             (queue_type, payload)
         )
-        db.commit()
+        commit_unless_nested(db)
+        UploadQueueModel.item_added.set()
 
     @staticmethod
     def get_pending(queue_type=None, limit=50):
         """Get pending items from queue"""
         db = get_db()
-        query = 'SELECT * FROM upload_queue WHERE retries < 5'
-        params = []
         if queue_type:
-            query += ' AND queue_type = ?'
-            params.append(queue_type)
-        query += ' ORDER BY created_at LIMIT ?'
-        params.append(limit)
-        return db.execute(query, params).fetchall()
+            return db.execute(_SQL_UPLOAD_QUEUE_PENDING_BY_TYPE, (queue_type, limit)).fetchall()
+        return db.execute(_SQL_UPLOAD_QUEUE_PENDING, (limit,)).fetchall()
 
     @staticmethod
     def mark_completed(queue_id):
         """Remove item from queue"""
+        UploadQueueModel.mark_completed_many([queue_id])
+
+    @staticmethod
+    def mark_completed_many(queue_ids):
+        """Remove several items from the queue in one transaction"""
         db = get_db()
-        db.execute('DELETE FROM upload_queue WHERE id = ?', (queue_id,))
+        db.executemany('DELETE FROM upload_queue WHERE id = ?', ((qid,) for qid in queue_ids))
         db.commit()
 
     @staticmethod
     def mark_failed(queue_id, error):
         """Increment retry count and store error"""
+        UploadQueueModel.mark_failed_many([(queue_id, error)])
+
+    @staticmethod
+    def mark_failed_many(failures):
+        """
+        Record several failed attempts in one transaction
+        Args:
+            failures: iterable of (queue_id, error)
+        """
         db = get_db()
-        db.execute(
+        db.executemany(
             'UPDATE upload_queue SET retries = retries + 1, last_error = ? WHERE id = ?',
-            (str(error), queue_id)
+            ((str(error), queue_id) for queue_id, error in failures)
         )
         db.commit()
 
@@ -525,21 +891,13 @@ class LocationModel:
     def get_all(active_only=True):
         """Get all locations"""
         db = get_db()
-        query = 'SELECT * FROM locations'
-        if active_only:
-            query += ' WHERE active = 1'
-        query += ' ORDER BY name'
-        return db.execute(query).fetchall()
+        return db.execute(_SQL_LOCATIONS_ALL[bool(active_only)]).fetchall()
 
     @staticmethod
     def get_by_site(site_id, active_only=True):
         """Get locations for a specific site"""
         db = get_db()
-        query = 'SELECT * FROM locations WHERE site_id = ?'
-        if active_only:
-            query += ' AND active = 1'
-        query += ' ORDER BY name'
-        return db.execute(query, (site_id,)).fetchall()
+        return db.execute(_SQL_LOCATIONS_BY_SITE[bool(active_only)], (site_id,)).fetchall()
 
     @staticmethod
     def get_by_id(location_id):
@@ -559,6 +917,23 @@ class LocationModel:
             (odoo_id,)
         ).fetchone()
 
+    @staticmethod
+    def get_by_odoo_ids(odoo_ids):
+        """
+        Get several locations in one query
+        Returns:
+            dict: {odoo_id: row} for the ids that exist
+        """
+        odoo_ids = list(odoo_ids)
+        if not odoo_ids:
+            return {}
+        db = get_db()
+        rows = db.execute(
+            'SELECT * FROM locations WHERE odoo_id IN (SELECT value FROM json_each(?))',
+            (json.dumps(odoo_ids),)
+        )
+        return {row['odoo_id']: row for row in rows}
+
     @staticmethod
     def count():
         """Count active locations"""
@@ -572,45 +947,28 @@ class LocationModel:
         db = get_db()
         now = datetime.now().isoformat()
 
-        # Mark all as inactive first
-        db.execute('UPDATE locations SET active = 0')
-
-        # Upsert each location
-        for loc in locations:
-            # Handle Many2one fields that come as [id, name] tuples
-            site_id = loc.get('site_id')
-            if isinstance(site_id, (list, tuple)):
-                site_id = site_id[0]
-
-            parent_id = loc.get('parent_id')
-            if isinstance(parent_id, (list, tuple)):
-                parent_id = parent_id[0]
-            elif parent_id is False:
-                parent_id = None
-
-            db.execute('''
-                INSERT INTO locations (odoo_id, site_id, name, code, camera_ip_address,
-                                       parent_id, active, synced_at)
-                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
-                ON CONFLICT(odoo_id) DO UPDATE SET
-                    site_id = excluded.site_id,
-                    name = excluded.name,
-                    code = excluded.code,
-                    camera_ip_address = excluded.camera_ip_address,
-                    parent_id = excluded.parent_id,
-                    active = 1,
-                    synced_at = excluded.synced_at
-            ''', (
-                loc.get('id'),
-                site_id,
-                loc.get('name') or None,
-                loc.get('code') or None,
-                loc.get('camera_ip_address') or None,
-                parent_id,
-                now
-            ))
+        # Many2one fields come as [id, name] pairs
+        rows = ((
+            loc.get('id'),
+            _m2o_id(loc.get('site_id')),
+            loc.get('name') or None,
+            loc.get('code') or None,
+            loc.get('camera_ip_address') or None,
+            _m2o_id(loc.get('parent_id')),
+            now
+        ) for loc in locations)
+
+        with _sync_transaction(db):
+            # Upsert each location
+            db.executemany(_SQL_LOCATIONS_UPSERT, rows)
+
+            # Deactivate whatever this sync didn't touch. Only removed rows
+            # are written, instead of resetting every row before the upsert.
+            db.execute(
+                'UPDATE locations SET active = 0 WHERE active = 1 AND synced_at IS NOT ?',
+                (now,)
+            )
 
-        db.commit()
         return len(locations)
 
 
@@ -621,31 +979,19 @@ class AnprCameraModel:
     def get_all(active_only=True):
         """Get all ANPR cameras"""
         db = get_db()
-        query = 'SELECT * FROM anpr_cameras'
-        if active_only:
-            query += ' WHERE active = 1'
-        query += ' ORDER BY name'
-        return db.execute(query).fetchall()
+        return db.execute(_SQL_ANPR_CAMERAS_ALL[bool(active_only)]).fetchall()
 
     @staticmethod
     def get_by_location(location_id, active_only=True):
         """Get ANPR cameras for a specific location"""
         db = get_db()
-        query = 'SELECT * FROM anpr_cameras WHERE location_id = ?'
-        if active_only:
-            query += ' AND active = 1'
-        query += ' ORDER BY name'
-        return db.execute(query, (location_id,)).fetchall()
+        return db.execute(_SQL_ANPR_CAMERAS_BY_LOCATION[bool(active_only)], (location_id,)).fetchall()
 
     @staticmethod
     def get_by_site(site_id, active_only=True):
         """Get ANPR cameras for a specific site"""
         db = get_db()
-        query = 'SELECT * FROM anpr_cameras WHERE site_id = ?'
-        if active_only:
-            query += ' AND active = 1'
-        query += ' ORDER BY name'
-        return db.execute(query, (site_id,)).fetchall()
+        return db.execute(_SQL_ANPR_CAMERAS_BY_SITE[bool(active_only)], (site_id,)).fetchall()
 
     @staticmethod
     def get_by_id(camera_id):
@@ -674,6 +1020,23 @@ class AnprCameraModel:
             (reg_code,)
         ).fetchone()
 
+    @staticmethod
+    def get_by_reg_code_cached(reg_code):
+        """
+        get_by_reg_code() for the per-event paths, memoized for
+        CAMERA_CACHE_TTL seconds. Heartbeat and capture columns in the
+        returned row may be stale; use get_by_reg_code() when they matter.
+        """
+        now = time.monotonic()
+        entry = _camera_by_reg_code.get(reg_code)
+        if entry is not None and now < entry[0]:
+            return entry[1]
+        camera = AnprCameraModel.get_by_reg_code(reg_code)
+        if len(_camera_by_reg_code) >= CAMERA_CACHE_MAX:
+            _camera_by_reg_code.clear()
+        _camera_by_reg_code[reg_code] = (now + CAMERA_CACHE_TTL, camera)
+        return camera
+
     @staticmethod
     def count():
         """Count active cameras"""
@@ -687,57 +1050,46 @@ class AnprCameraModel:
         db = get_db()
         now = datetime.now().isoformat()
 
-        # Mark all as inactive first
-        db.execute('UPDATE anpr_cameras SET active = 0')
-
-        # Upsert each camera
-        for cam in cameras:
-            # Handle Many2one fields
-            location_id = cam.get('location_id')
-            if isinstance(location_id, (list, tuple)):
-                location_id = location_id[0]
-            elif location_id is False:
-                location_id = None
-
-            site_id = cam.get('site_id')
-            if isinstance(site_id, (list, tuple)):
-                site_id = site_id[0]
-
-            db.execute('''
-                INSERT INTO anpr_cameras (odoo_id, location_id, site_id, name, reg_code,
-                                          reg_password, active, synced_at)
-                VALUES (?, ?, ?, ?, ?, ?, 1, ?)
-                ON CONFLICT(odoo_id) DO UPDATE SET
-                    location_id = excluded.location_id,
-                    site_id = excluded.site_id,
-                    name = excluded.name,
-                    reg_code = excluded.reg_code,
-                    reg_password = excluded.reg_password,
-                    active = 1,
-                    synced_at = excluded.synced_at
-            ''', (
-                cam.get('id'),
-                location_id,
-                site_id,
-                cam.get('name') or None,
-                cam.get('reg_code') or None,
-                cam.get('reg_password') or None,
-                now
-            ))
-
-        db.commit()
+        # Many2one fields come as [id, name] pairs
+        rows = ((
+            cam.get('id'),
+            _m2o_id(cam.get('location_id')),
+            _m2o_id(cam.get('site_id')),
+            cam.get('name') or None,
+            cam.get('reg_code') or None,
+            cam.get('reg_password') or None,
+            now
+        ) for cam in cameras)
+
+        with _sync_transaction(db):
+            # Upsert each camera
+            db.executemany(_SQL_ANPR_CAMERAS_UPSERT, rows)
+
+            # Deactivate whatever this sync didn't touch. Only removed rows
+            # are written, instead of resetting every row before the upsert.
+            db.execute(
+                'UPDATE anpr_cameras SET active = 0 WHERE active = 1 AND synced_at IS NOT ?',
+                (now,)
+            )
+
+        AnprCameraModel.clear_cache()
         return len(cameras)
 
     @staticmethod
     def get_relay_channels(reg_code):
-        """Get relay channels for a camera by reg_code"""
-        camera = AnprCameraModel.get_by_reg_code(reg_code)
-        if camera and camera['relay_channels']:
-            try:
-                return json.loads(camera['relay_channels'])
-            except (json.JSONDecodeError, TypeError):
-                return [int(camera['relay_channels'])]
-        return []  # No relay configured
+        """Get relay channels for a camera by reg_code (cached)"""
+        return list(_anpr_relay_channels(reg_code))  # Empty if no relay configured
+
+    @staticmethod
+    def parse_relay_channels(value):
+        """relay_channels column value as a list of channels ([] if unset)"""
+        return list(_relay_channel_tuple(value)) if value else []
+
+    @staticmethod
+    def clear_cache():
+        """Drop memoized camera and relay channel lookups (call after any write)"""
+        _anpr_relay_channels.cache_clear()
+        _camera_by_reg_code.clear()
 
     @staticmethod
     def set_relay_channels(camera_id, relay_channels):
@@ -750,6 +1102,7 @@ class AnprCameraModel:
             (relay_channels, camera_id)
         )
         db.commit()
+        AnprCameraModel.clear_cache()
 
     @staticmethod
     def set_relay_channels_by_reg_code(reg_code, relay_channels):
@@ -762,17 +1115,12 @@ class AnprCameraModel:
             (relay_channels, reg_code)
         )
         db.commit()
+        AnprCameraModel.clear_cache()
 
     @staticmethod
     def update_heartbeat(reg_code):
-        """Update last heartbeat timestamp for a camera"""
-        db = get_db()
-        now = datetime.now().isoformat()
-        db.execute(
-            'UPDATE anpr_cameras SET last_heartbeat = ? WHERE reg_code = ?',
-            (now, reg_code)
-        )
-        db.commit()
+        """Update last heartbeat timestamp for a camera (written behind)"""
+        heartbeat_writer.touch(reg_code)
 
     @staticmethod
     def update_heartbeat_by_id(camera_id):
@@ -783,7 +1131,7 @@ class AnprCameraModel:
             'UPDATE anpr_cameras SET last_heartbeat = ? WHERE id = ?',
             (now, camera_id)
         )
-        db.commit()
+        commit_unless_nested(db)
 
     @staticmethod
     def get_health_status(timeout_minutes=5):
@@ -961,7 +1309,7 @@ class AnprCameraModel:
             'last_poll_error = NULL WHERE id = ?',
             (plate, datetime.now().isoformat(), camera_id)
         )
-        db.commit()
+        commit_unless_nested(db)
 
     @staticmethod
     def record_poll_error(camera_id, error):
@@ -971,7 +1319,7 @@ class AnprCameraModel:
             'UPDATE anpr_cameras SET last_poll_error = ? WHERE id = ?',
             (str(error)[:500], camera_id)
         )
-        db.commit()
+        commit_unless_nested(db)
 
 
 class AuditLogModel:
@@ -985,7 +1333,7 @@ class AuditLogModel:
             INSERT INTO audit_logs (timestamp, action, user, ip_address, details, resource_type, resource_id)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', (datetime.now().isoformat(), action, user, ip_address, details, resource_type, resource_id))
-        db.commit()
+        commit_unless_nested(db)
 
     @staticmethod
     def get_recent(limit=100):
@@ -997,11 +1345,9 @@ class AuditLogModel:
         ).fetchall()
 
     @staticmethod
-    def get_paginated(page=1, per_page=50, action=None, search=None, date_from=None, date_to=None):
-        """Get audit logs with pagination and filters"""
-        db = get_db()
-        offset = (page - 1) * per_page
-        query = 'SELECT * FROM audit_logs WHERE 1=1'
+    def _filters(action=None, search=None, date_from=None, date_to=None):
+        """WHERE clause and params shared by count() and the page queries"""
+        query = ' WHERE 1=1'
         params = []
 
         if action:
@@ -1010,38 +1356,44 @@ class AuditLogModel:
         if search:
             query += ' AND (user LIKE ? OR details LIKE ? OR ip_address LIKE ?)'
             params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
+        # Plain timestamp ranges so idx_audit_timestamp applies; date(?, '+1 day')
+        # is evaluated once per query, not per row
         if date_from:
-            query += ' AND date(timestamp) >= ?'
+            query += ' AND timestamp >= ?'
             params.append(date_from)
         if date_to:
-            query += ' AND date(timestamp) <= ?'
+            query += " AND timestamp < date(?, '+1 day')"
             params.append(date_to)
+        return query, params
 
-        query += ' ORDER BY timestamp DESC LIMIT ? OFFSET ?'
+    @staticmethod
+    def get_paginated(page=1, per_page=50, action=None, search=None, date_from=None, date_to=None):
+        """Get audit logs with pagination and filters"""
+        db = get_db()
+        offset = (page - 1) * per_page
+        where, params = AuditLogModel._filters(action, search, date_from, date_to)
+        query = 'SELECT * FROM audit_logs' + where + ' ORDER BY timestamp DESC LIMIT ? OFFSET ?'
         params.extend([per_page, offset])
         return db.execute(query, params).fetchall()
 
+    @staticmethod
+    def get_page_after(cursor=None, per_page=50, action=None, search=None, date_from=None, date_to=None):
+        """
+        Keyset-paginated audit logs, newest first
+        Args:
+            cursor: next_cursor from the previous page (None for the first)
+        Returns:
+            (rows, next_cursor)
+        """
+        where, params = AuditLogModel._filters(action, search, date_from, date_to)
+        return _page_after('audit_logs', '*', where, params, cursor, per_page)
+
     @staticmethod
     def count(action=None, search=None, date_from=None, date_to=None):
         """Count audit logs"""
         db = get_db()
-        query = 'SELECT COUNT(*) as cnt FROM audit_logs WHERE 1=1'
-        params = []
-
-        if action:
-            query += ' AND action = ?'
-            params.append(action)
-        if search:
-            query += ' AND (user LIKE ? OR details LIKE ? OR ip_address LIKE ?)'
-            params.extend([f'%{search}%', f'%{search}%', f'%{search}%'])
-        if date_from:
-            query += ' AND date(timestamp) >= ?'
-            params.append(date_from)
-        if date_to:
-            query += ' AND date(timestamp) <= ?'
-            params.append(date_to)
-
-        result = db.execute(query, params).fetchone()
+        where, params = AuditLogModel._filters(action, search, date_from, date_to)
+        result = db.execute('SELECT COUNT(*) as cnt FROM audit_logs' + where, params).fetchone()
         return result['cnt'] if result else 0
 
     @staticmethod
@@ -1060,63 +1412,75 @@ class BlacklistModel:
     def get_all(active_only=True):
         """Get all blacklisted plates"""
         db = get_db()
-        query = 'SELECT * FROM blacklist'
-        if active_only:
-            query += ' WHERE active = 1'
-        query += ' ORDER BY added_at DESC'
-        return db.execute(query).fetchall()
+        return db.execute(_SQL_BLACKLIST_ALL[bool(active_only)]).fetchall()
 
     @staticmethod
     def get_by_plate(plate):
         """Check if plate is blacklisted (case-insensitive)"""
         db = get_db()
         return db.execute(
-            'SELECT * FROM blacklist WHERE UPPER(plate) = UPPER(?) AND active = 1',
+            'SELECT * FROM blacklist WHERE plate = ? COLLATE NOCASE AND active = 1',
             (plate,)
         ).fetchone()
 
     @staticmethod
     def is_blacklisted(plate):
-        """Check if plate is currently blacklisted"""
-        entry = BlacklistModel.get_by_plate(plate)
-        if not entry:
+        """Check if plate is currently blacklisted (served from memory)"""
+        blacklist = _active_blacklist()
+        key = plate.upper()
+        if key not in blacklist:
             return False
         # Check expiry
-        if entry['expires_at']:
-            if datetime.now().isoformat() > entry['expires_at']:
+        expires_at = blacklist[key]
+        if expires_at:
+            if datetime.now().isoformat() > expires_at:
                 return False
         return True
 
+    @staticmethod
+    def clear_cache():
+        """Drop the in-memory blacklist (call after any write)"""
+        _active_blacklist.cache_clear()
+
     @staticmethod
     def add(plate, reason=None, added_by=None, expires_at=None):
         """Add plate to blacklist"""
+        return BlacklistModel.add_many([{
+            'plate': plate, 'reason': reason, 'added_by': added_by, 'expires_at': expires_at,
+        }])
+
+    @staticmethod
+    def add_many(entries):
+        """
+        Add or refresh several blacklist entries in one transaction
+        Args:
+            entries: iterable of dicts with plate and optional reason,
+                     added_by, expires_at
+        """
         db = get_db()
-        plate = plate.upper().strip()
-        try:
-            db.execute('''
-                INSERT INTO blacklist (plate, reason, added_by, added_at, expires_at, active)
-                VALUES (?, ?, ?, ?, ?, 1)
-            ''', (plate, reason, added_by, datetime.now().isoformat(), expires_at))
-            db.commit()
-            return True
-        except Exception:
-            # Already exists, update it
-            db.execute('''
-                UPDATE blacklist SET reason = ?, added_by = ?, added_at = ?, expires_at = ?, active = 1
-                WHERE UPPER(plate) = UPPER(?)
-            ''', (reason, added_by, datetime.now().isoformat(), expires_at, plate))
-            db.commit()
-            return True
+        now = datetime.now().isoformat()
+        rows = ((
+            e['plate'].upper().strip(),
+            e.get('reason'),
+            e.get('added_by'),
+            now,
+            e.get('expires_at'),
+        ) for e in entries)
+        with _sync_transaction(db):
+            db.executemany(_SQL_BLACKLIST_UPSERT, rows)
+        BlacklistModel.clear_cache()
+        return True
 
     @staticmethod
     def remove(plate):
         """Remove plate from blacklist (soft delete)"""
         db = get_db()
         db.execute(
-            'UPDATE blacklist SET active = 0 WHERE UPPER(plate) = UPPER(?)',
+            'UPDATE blacklist SET active = 0 WHERE plate = ? COLLATE NOCASE',
             (plate.upper(),)
         )
         db.commit()
+        BlacklistModel.clear_cache()
 
     @staticmethod
     def delete(blacklist_id):
@@ -1124,13 +1488,11 @@ class BlacklistModel:
         db = get_db()
         db.execute('DELETE FROM blacklist WHERE id = ?', (blacklist_id,))
         db.commit()
+        BlacklistModel.clear_cache()
 
     @staticmethod
     def count(active_only=True):
         """Count blacklisted plates"""
         db = get_db()
-        query = 'SELECT COUNT(*) as cnt FROM blacklist'
-        if active_only:
-            query += ' WHERE active = 1'
-        result = db.execute(query).fetchone()
+        result = db.execute(_SQL_BLACKLIST_COUNT[bool(active_only)]).fetchone()
         return result['cnt'] if result else 0
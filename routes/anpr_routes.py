@@ -5,12 +5,25 @@ Receives events from Hikvision and other ANPR cameras
 Camera identification is done via reg_code (registration code) instead of IP address.
 Each camera has a unique reg_code configured in Odoo, which maps to a location.
 """
-from flask import request, jsonify
+from flask import current_app, request, jsonify
 import base64
 import logging
-import xml.etree.ElementTree as ET
+from binascii import a2b_base64
+from datetime import datetime
+
+# lxml (libxml2) parses anpr.xml faster; without it the stdlib parser is used
+try:
+    from lxml import etree as ET
+    # No entity expansion or network fetches for camera-supplied XML
+    _XML_PARSER = ET.XMLParser(resolve_entities=False, no_network=True, huge_tree=False)
+    _XML_ERRORS = (ET.XMLSyntaxError,)
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _XML_PARSER = None
+    _XML_ERRORS = (ET.ParseError,)
 
 from . import anpr_bp
+from config import config
 from services.anpr_service import anpr_service
 from services.access_service import access_service
 from services.websocket_service import websocket_service
@@ -37,6 +50,73 @@ _DAHUA_VEHICLE_IMAGE_KEYS = (
     'Picture.Vehicle.Image',
 )
 
+# Hikvision multipart picture names (lower-cased), by image kind
+_HIK_PLATE_FILES = frozenset({'licenseplatepicture.jpg', 'licenseplatepicture_1.jpg'})
+_HIK_VEHICLE_FILES = frozenset({
+    'detectionpicture.jpg', 'detectionpicture_1.jpg',
+    'pedestriandetectionpicture.jpg', 'pedestriandetectionpicture_1.jpg',
+})
+
+
+def _request_json(silent=False):
+    """
+    Decode the request body as JSON regardless of Content-Type, through the
+    app's JSON provider (orjson when installed). The raw body is not kept
+    on the request. Invalid JSON returns None when silent, else raises.
+    """
+    try:
+        return current_app.json.loads(request.get_data(cache=False))
+    except ValueError:
+        if silent:
+            return None
+        raise
+
+
+def _parse_xml(data):
+    """Parse an XML payload with the module's parser (lxml if available)"""
+    if _XML_PARSER is not None:
+        return ET.fromstring(data, _XML_PARSER)
+    return ET.fromstring(data)
+
+
+if _XML_PARSER is not None:
+    # First non-blank element with the given local name (namespace stripped,
+    # any case), evaluated inside libxml2 instead of a Python loop
+    _PLATE_XPATHS = {
+        name: ET.XPath(
+            "(//*[translate(local-name(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', "
+            f"'abcdefghijklmnopqrstuvwxyz') = '{name}'][normalize-space(text())])[1]/text()"
+        )
+        for name in ('licenseplate', 'originallicenseplate')
+    }
+
+
+def _xml_plate(root, names):
+    """
+    Text of the first non-blank element whose local tag name (lower-cased)
+    is in names, preferring earlier names. Returns (tag, text) or (None, None).
+    """
+    if _XML_PARSER is not None:
+        for name in names:
+            found = _PLATE_XPATHS[name](root)
+            if found:
+                return name, found[0].strip()
+        return None, None
+
+    found = {}
+    for elem in root.iter():
+        if not isinstance(elem.tag, str):
+            continue
+        local_tag = (elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag).lower()
+        if local_tag in names and local_tag not in found and elem.text and elem.text.strip():
+            found[local_tag] = elem.text.strip()
+            if local_tag == names[0]:
+                break
+    for name in names:
+        if name in found:
+            return name, found[name]
+    return None, None
+
 
 def _walk_path(obj, dotted):
     cur = obj
@@ -146,9 +226,10 @@ def hikfeed(code="", password=""):
             code = request.args.get('code', '')
             password = request.args.get('password', '')
 
-        logger.info(f"Hikvision feed from {camera_ip}, code: {code}")
-        logger.info(f"Content-Type: {request.content_type}")
-        logger.info(f"Files received: {list(request.files.keys())}")
+        logger.info("Hikvision feed from %s, code: %s", camera_ip, code)
+        logger.info("Content-Type: %s", request.content_type)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Files received: %s", list(request.files.keys()))
 
         plate = None
         # Store all images received (up to 6 possible files)
@@ -159,85 +240,72 @@ def hikfeed(code="", password=""):
 
         # Check if XML is in request body directly (not multipart)
         if not request.files and request.data:
-            logger.info(f"No files, checking request body (length: {len(request.data)})")
+            logger.info("No files, checking request body (length: %s)", len(request.data))
             try:
                 xml_data = request.data
-                root = ET.fromstring(xml_data)
-                for elem in root.iter():
-                    local_tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                    if local_tag.lower() == 'licenseplate':
-                        if elem.text and elem.text.strip():
-                            plate = elem.text.strip().replace(' ', '').upper()
-                            logger.info(f"Found plate in body XML: {plate}")
-                            break
-            except ET.ParseError as e:
-                logger.error(f"Failed to parse body as XML: {e}")
+                root = _parse_xml(xml_data)
+                _, text = _xml_plate(root, ('licenseplate',))
+                if text:
+                    plate = text.replace(' ', '').upper()
+                    logger.info("Found plate in body XML: %s", plate)
+            except _XML_ERRORS as e:
+                logger.error("Failed to parse body as XML: %s", e)
 
         # Process multipart files
-        for file_key in request.files:
-            xml_file = request.files[file_key]
+        # multi=True: files sharing a form key are all processed, not just the first
+        for file_key, xml_file in request.files.items(multi=True):
             filename = xml_file.filename or ''
             # Use filename for type detection - camera may use random IDs as form field keys
-            logger.info(f"Processing file: key='{file_key}', filename='{filename}'")
+            logger.info("Processing file: key='%s', filename='%s'", file_key, filename)
+            name = filename.lower()
 
             # Parse XML files (anpr.xml, ANPR.xml, or any .xml file)
-            if filename.lower() == 'anpr.xml' or filename.lower().endswith('.xml'):
+            if name.endswith('.xml'):
                 xml_data = xml_file.read()
-                logger.debug(f"Received XML data: {xml_data[:500]}...")
+                logger.debug("Received XML data: %.500s...", xml_data)
                 try:
-                    root = ET.fromstring(xml_data)
+                    root = _parse_xml(xml_data)
                     plate = None
 
-                    # Method 1: Find licensePlate element (handles namespaces)
-                    # Tag names with namespace look like: {http://...}licensePlate
-                    for elem in root.iter():
-                        # Get local tag name (strip namespace)
-                        local_tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-
-                        if local_tag.lower() == 'licenseplate':
-                            if elem.text and elem.text.strip():
-                                plate = elem.text.strip()
-                                logger.info(f"Found plate in <{local_tag}>: {plate}")
-                                break
-                        elif local_tag.lower() == 'originallicenseplate' and not plate:
-                            if elem.text and elem.text.strip():
-                                plate = elem.text.strip()
-                                logger.info(f"Found plate in <{local_tag}>: {plate}")
-
-                    # Method 2: Try index-based access (original Odoo method for older cameras)
-                    if not plate:
+                    # Method 1: Find licensePlate element (handles namespaces),
+                    # falling back to originalLicensePlate
+                    local_tag, plate = _xml_plate(root, ('licenseplate', 'originallicenseplate'))
+                    if plate:
+                        logger.info("Found plate in <%s>: %s", local_tag, plate)
+
+                    # Method 2: Try index-based access (original Odoo method for
+                    # older cameras). Opt-in, since current firmware always
+                    # sends a licensePlate element.
+                    if not plate and config.get('hikvision_index_fallback', 'false') == 'true':
                         try:
                             plate = root[13][1].text
                             if plate:
-                                logger.info(f"Found plate via index [13][1]: {plate}")
+                                logger.warning("Found plate via legacy index [13][1]: %s", plate)
                         except (IndexError, TypeError):
                             pass
 
                     if plate:
                         plate = plate.replace(' ', '').upper()
-                        logger.info(f"Extracted plate from XML: {plate}")
+                        logger.info("Extracted plate from XML: %s", plate)
 
-                except ET.ParseError as e:
-                    logger.error(f"Failed to parse anpr.xml: {e}")
+                except _XML_ERRORS as e:
+                    logger.error("Failed to parse anpr.xml: %s", e)
 
             # Plate images (licensePlatePicture.jpg, licensePlatePicture_1.jpg)
-            elif filename.lower() in ['licenseplatepicture.jpg', 'licenseplatepicture_1.jpg']:
-                img_data = xml_file.read()
-                if img_data:
-                    images['plate'].append({'filename': filename, 'data': img_data})
-                    logger.info(f"Received plate image: {filename} ({len(img_data)} bytes)")
+            elif name in _HIK_PLATE_FILES:
+                # Passed on as a stream and copied to disk by process_vehicle
+                images['plate'].append({'filename': filename, 'stream': xml_file.stream})
+                logger.info("Received plate image: %s", filename)
 
             # Detection/vehicle images (all 4 variants)
-            elif filename.lower() in ['detectionpicture.jpg', 'detectionpicture_1.jpg',
-                              'pedestriandetectionpicture.jpg', 'pedestriandetectionpicture_1.jpg']:
-                img_data = xml_file.read()
-                if img_data:
-                    images['vehicle'].append({'filename': filename, 'data': img_data})
-                    logger.info(f"Received vehicle image: {filename} ({len(img_data)} bytes)")
+            elif name in _HIK_VEHICLE_FILES:
+                # Passed on as a stream and copied to disk by process_vehicle
+                images['vehicle'].append({'filename': filename, 'stream': xml_file.stream})
+                logger.info("Received vehicle image: %s", filename)
 
         # Check if we got a plate number
         if not plate:
-            logger.warning(f"No plate number in Hikvision feed from {camera_ip}")
+            logger.warning("No plate number in Hikvision feed from %s", camera_ip)
             return jsonify({'success': False, 'error': 'No plate number detected'}), 400
 
         # Look up camera by reg_code to get location_id
@@ -245,24 +313,26 @@ def hikfeed(code="", password=""):
         location_id = None
 
         if code:
-            camera = AnprCameraModel.get_by_reg_code(code)
+            camera = AnprCameraModel.get_by_reg_code_cached(code)
             if camera:
                 location_id = camera['location_id']
-                logger.info(f"Camera identified: {camera['name']} (code: {code}, location_id: {location_id})")
+                logger.info("Camera identified: %s (code: %s, location_id: %s)",
+                            camera['name'], code, location_id)
                 # Update heartbeat on ANPR event
                 AnprCameraModel.update_heartbeat(code)
             else:
-                logger.warning(f"Unknown camera code: {code}")
+                logger.warning("Unknown camera code: %s", code)
 
         # Log image counts
-        logger.info(f"Images received: {len(images['plate'])} plate, {len(images['vehicle'])} vehicle")
+        logger.info("Images received: %s plate, %s vehicle",
+                    len(images['plate']), len(images['vehicle']))
 
         # Process vehicle access - pass all images
         result = access_service.process_vehicle(
             plate=plate,
             camera_ip=camera_ip,
-            plate_images=images['plate'],    # List of {'filename': ..., 'data': ...}
-            vehicle_images=images['vehicle'],  # List of {'filename': ..., 'data': ...}
+            plate_images=images['plate'],    # List of {'filename': ..., 'stream': ...}
+            vehicle_images=images['vehicle'],  # List of {'filename': ..., 'stream': ...}
             location_id=location_id,
             camera_name=camera['name'] if camera else None,
             reg_code=code  # For relay mapping from ANPR camera
@@ -281,7 +351,7 @@ def hikfeed(code="", password=""):
         })
 
     except Exception as e:
-        logger.error(f"Error processing Hikvision feed: {e}", exc_info=True)
+        logger.error("Error processing Hikvision feed: %s", e, exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -343,7 +413,7 @@ def dahua_event(reg_code=None, password=None):
             if data is None:
                 data = form_kv
         elif 'json' in content_type:
-            data = request.get_json(force=True, silent=True) or {}
+            data = _request_json(silent=True) or {}
         else:
             data = dict(request.form) if request.form else {}
             # Some firmwares post a bare JSON body with form content-type.
@@ -386,15 +456,19 @@ def dahua_event(reg_code=None, password=None):
         location_id = None
         camera_name = None
         if reg_code:
+            from database.db import db_transaction
             from database.models import AnprCameraModel
-            camera = AnprCameraModel.get_by_reg_code(reg_code)
+            camera = AnprCameraModel.get_by_reg_code_cached(reg_code)
             if camera:
                 camera_id = camera['id']
                 location_id = camera['location_id']
                 camera_name = camera['name']
                 try:
-                    AnprCameraModel.update_heartbeat(reg_code)
-                    AnprCameraModel.record_capture(camera_id, event['plate'])
+                    # One commit for both camera updates (the heartbeat only
+                    # writes here while the heartbeat writer isn't running)
+                    with db_transaction():
+                        AnprCameraModel.update_heartbeat(reg_code)
+                        AnprCameraModel.record_capture(camera_id, event['plate'])
                 except Exception:
                     pass
 
@@ -424,7 +498,7 @@ def dahua_event(reg_code=None, password=None):
         })
 
     except Exception as e:
-        logger.error(f"Error processing Dahua event: {e}", exc_info=True)
+        logger.error("Error processing Dahua event: %s", e, exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -445,7 +519,7 @@ def generic_event():
     Camera is identified by reg_code, which maps to a location in Odoo.
     """
     try:
-        data = request.get_json(force=True)
+        data = _request_json()
 
         plate = data.get('plate') or data.get('number') or data.get('plateNumber')
         if not plate:
@@ -459,26 +533,25 @@ def generic_event():
         location_id = None
 
         if reg_code:
-            camera = AnprCameraModel.get_by_reg_code(reg_code)
+            camera = AnprCameraModel.get_by_reg_code_cached(reg_code)
             if camera:
                 location_id = camera['location_id']
-                logger.info(f"Camera identified: {camera['name']} (reg_code: {reg_code}, location_id: {location_id})")
+                logger.info("Camera identified: %s (reg_code: %s, location_id: %s)",
+                            camera['name'], reg_code, location_id)
                 # Update heartbeat on ANPR event
                 AnprCameraModel.update_heartbeat(reg_code)
             else:
-                logger.warning(f"Unknown camera reg_code: {reg_code}")
+                logger.warning("Unknown camera reg_code: %s", reg_code)
 
         # Decode images if provided
         plate_image = None
         vehicle_image = None
 
         if data.get('plate_image'):
-            import base64
-            plate_image = base64.b64decode(data['plate_image'])
+            plate_image = a2b_base64(data['plate_image'])
 
         if data.get('vehicle_image'):
-            import base64
-            vehicle_image = base64.b64decode(data['vehicle_image'])
+            vehicle_image = a2b_base64(data['vehicle_image'])
 
         result = access_service.process_vehicle(
             plate=plate,
@@ -503,7 +576,7 @@ def generic_event():
         })
 
     except Exception as e:
-        logger.error(f"Error processing generic event: {e}", exc_info=True)
+        logger.error("Error processing generic event: %s", e, exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -526,24 +599,24 @@ def camera_heartbeat(reg_code=None):
         if not reg_code:
             return jsonify({'success': False, 'error': 'reg_code required'}), 400
 
-        camera = AnprCameraModel.get_by_reg_code(reg_code)
+        camera = AnprCameraModel.get_by_reg_code_cached(reg_code)
         if not camera:
-            logger.warning(f"Heartbeat from unknown camera: {reg_code}")
+            logger.warning("Heartbeat from unknown camera: %s", reg_code)
             return jsonify({'success': False, 'error': 'Unknown camera'}), 404
 
         # Update heartbeat timestamp
         AnprCameraModel.update_heartbeat(reg_code)
-        logger.debug(f"Heartbeat received from {camera['name']} ({reg_code})")
+        logger.debug("Heartbeat received from %s (%s)", camera['name'], reg_code)
 
         return jsonify({
             'success': True,
             'camera_name': camera['name'],
             'reg_code': reg_code,
-            'timestamp': __import__('datetime').datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat()
         })
 
     except Exception as e:
-        logger.error(f"Heartbeat error: {e}", exc_info=True)
+        logger.error("Heartbeat error: %s", e, exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -561,7 +634,7 @@ def test_event():
     location_id = None
 
     if reg_code:
-        camera = AnprCameraModel.get_by_reg_code(reg_code)
+        camera = AnprCameraModel.get_by_reg_code_cached(reg_code)
         if camera:
             location_id = camera['location_id']
 
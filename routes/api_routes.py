@@ -2,12 +2,16 @@
 REST API Routes
 Local management and data access endpoints
 """
-from flask import request, jsonify, send_from_directory
+from functools import wraps
+from flask import request, jsonify, make_response, send_from_directory
 import os
 import logging
+import shutil
+import sqlite3
 
 from . import api_bp
-from database.models import VehicleModel, BarrierModel, AccessLogModel, LocationModel, AnprCameraModel
+from database.models import VehicleModel, BarrierModel, AccessLogModel, LocationModel, AnprCameraModel, BlacklistModel
+from database.log_writer import access_log_writer
 from services.relay_service import relay_service
 from services.sync_service import sync_service
 from services.websocket_service import websocket_service
@@ -16,6 +20,66 @@ from config import config, IMAGES_DIR
 
 logger = logging.getLogger(__name__)
 
+# Seconds browsers may cache a served capture image
+IMAGE_MAX_AGE = 86400
+
+# Local data wiped by clear-data, as one script/transaction
+_SQL_CLEAR_DATA = '''
+    BEGIN;
+    DELETE FROM vehicles;
+    DELETE FROM access_logs;
+    DELETE FROM locations;
+    DELETE FROM anpr_cameras;
+    DELETE FROM barrier_mapping;
+    DELETE FROM upload_queue;
+    COMMIT;
+'''
+# Factory reset additionally drops all settings
+_SQL_FACTORY_RESET = '''
+    BEGIN;
+    DELETE FROM vehicles;
+    DELETE FROM access_logs;
+    DELETE FROM locations;
+    DELETE FROM anpr_cameras;
+    DELETE FROM barrier_mapping;
+    DELETE FROM upload_queue;
+    DELETE FROM config;
+    COMMIT;
+'''
+
+
+def _conditional_get(view):
+    """
+    Tag 200 responses with an ETag of their body and answer a matching
+    If-None-Match with 304, so unchanged list polls skip the transfer.
+    Clients must still revalidate every time (no-cache).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.add_etag()
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            response.make_conditional(request)
+        return response
+    return wrapper
+
+
+def _clear_images():
+    """Delete everything under IMAGES_DIR (date folders included), keeping the directory"""
+    shutil.rmtree(IMAGES_DIR, ignore_errors=True)
+    os.makedirs(IMAGES_DIR, exist_ok=True)
+
+
+def _run_script(conn, script):
+    """executescript() a BEGIN...COMMIT script, rolling back if it fails"""
+    try:
+        conn.executescript(script)
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
 
 # ============== Authentication ==============
 
@@ -93,13 +157,14 @@ def auth_test():
 # ============== Vehicles ==============
 
 @api_bp.route('/api/vehicles', methods=['GET'])
+@_conditional_get
 def list_vehicles():
     """List all vehicles"""
     try:
         vehicles = VehicleModel.get_all()
         return jsonify({
             'success': True,
-            'vehicles': [dict(v) for v in vehicles],
+            'vehicles': vehicles,
             'total': len(vehicles)
         })
     except Exception as e:
@@ -116,7 +181,7 @@ def search_vehicles():
         vehicles = VehicleModel.search(query, limit)
         return jsonify({
             'success': True,
-            'vehicles': [dict(v) for v in vehicles],
+            'vehicles': vehicles,
             'total': len(vehicles)
         })
     except Exception as e:
@@ -142,13 +207,14 @@ def get_vehicle(plate):
 # ============== Locations ==============
 
 @api_bp.route('/api/locations', methods=['GET'])
+@_conditional_get
 def list_locations():
     """List all locations (synced from Odoo)"""
     try:
         locations = LocationModel.get_all()
         return jsonify({
             'success': True,
-            'locations': [dict(loc) for loc in locations],
+            'locations': locations,
             'total': len(locations)
         })
     except Exception as e:
@@ -173,13 +239,14 @@ def get_location(location_id):
 # ============== ANPR Cameras ==============
 
 @api_bp.route('/api/anpr-cameras', methods=['GET'])
+@_conditional_get
 def list_anpr_cameras():
     """List all ANPR cameras (synced from Odoo)"""
     try:
         cameras = AnprCameraModel.get_all()
         return jsonify({
             'success': True,
-            'cameras': [dict(cam) for cam in cameras],
+            'cameras': cameras,
             'total': len(cameras)
         })
     except Exception as e:
@@ -248,15 +315,33 @@ def anpr_camera_relay(reg_code):
 
 @api_bp.route('/api/access-logs', methods=['GET'])
 def list_access_logs():
-    """List recent access logs"""
+    """
+    List recent access logs
+    Pass ?cursor= (empty for the first page) to page through older logs;
+    the response then carries next_cursor, null on the last page.
+    """
     limit = request.args.get('limit', 50, type=int)
     vehicle_type = request.args.get('type')
+    cursor = request.args.get('cursor')
 
     try:
+        if cursor is not None:
+            try:
+                logs, next_cursor = AccessLogModel.get_page_after(
+                    cursor or None, per_page=limit, vehicle_type=vehicle_type)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+            return jsonify({
+                'success': True,
+                'logs': logs,
+                'total': len(logs),
+                'next_cursor': next_cursor
+            })
+
         logs = AccessLogModel.get_recent(limit, vehicle_type)
         return jsonify({
             'success': True,
-            'logs': [dict(log) for log in logs],
+            'logs': logs,
             'total': len(logs)
         })
     except Exception as e:
@@ -279,13 +364,14 @@ def get_access_stats():
 # ============== Barriers ==============
 
 @api_bp.route('/api/barriers', methods=['GET'])
+@_conditional_get
 def list_barriers():
     """List barrier mappings"""
     try:
         barriers = BarrierModel.get_all()
         return jsonify({
             'success': True,
-            'barriers': [dict(b) for b in barriers]
+            'barriers': barriers
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -835,7 +921,9 @@ def health_check():
 def serve_image(filename):
     """Serve local images"""
     try:
-        return send_from_directory(IMAGES_DIR, filename)
+        # Image names are unique per capture and never rewritten, so
+        # browsers may keep them; revalidation still works via ETag
+        return send_from_directory(IMAGES_DIR, filename, max_age=IMAGE_MAX_AGE)
     except Exception as e:
         return jsonify({'error': 'Image not found'}), 404
 
@@ -872,29 +960,17 @@ def clear_all_data():
     try:
         from database.db import get_db
 
-        conn = get_db()
-        cursor = conn.cursor()
+        # Commit queued access logs first so they don't land after the wipe
+        access_log_writer.flush()
 
         # Clear all data tables
-        cursor.execute('DELETE FROM vehicles')
-        cursor.execute('DELETE FROM access_logs')
-        cursor.execute('DELETE FROM locations')
-        cursor.execute('DELETE FROM anpr_cameras')
-        cursor.execute('DELETE FROM barrier_mapping')
-        cursor.execute('DELETE FROM upload_queue')
-
-        conn.commit()
+        _run_script(get_db(), _SQL_CLEAR_DATA)
+        BarrierModel.clear_cache()
+        AnprCameraModel.clear_cache()
+        AccessLogModel.clear_cache()
 
         # Clear images directory
-        import shutil
-        if os.path.exists(IMAGES_DIR):
-            for filename in os.listdir(IMAGES_DIR):
-                filepath = os.path.join(IMAGES_DIR, filename)
-                try:
-                    if os.path.isfile(filepath):
-                        os.unlink(filepath)
-                except Exception:
-                    pass
+        _clear_images()
 
         logger.info("All local data cleared")
         return jsonify({
@@ -934,30 +1010,18 @@ def factory_reset():
     try:
         from database.db import get_db
 
-        conn = get_db()
-        cursor = conn.cursor()
-
-        # Clear all data tables
-        cursor.execute('DELETE FROM vehicles')
-        cursor.execute('DELETE FROM access_logs')
-        cursor.execute('DELETE FROM locations')
-        cursor.execute('DELETE FROM anpr_cameras')
-        cursor.execute('DELETE FROM barrier_mapping')
-        cursor.execute('DELETE FROM upload_queue')
-        cursor.execute('DELETE FROM config')
+        # Commit queued access logs first so they don't land after the wipe
+        access_log_writer.flush()
 
-        conn.commit()
+        # Clear all data tables and settings
+        _run_script(get_db(), _SQL_FACTORY_RESET)
+        BarrierModel.clear_cache()
+        AnprCameraModel.clear_cache()
+        AccessLogModel.clear_cache()
+        BlacklistModel.clear_cache()
 
         # Clear images
-        import shutil
-        if os.path.exists(IMAGES_DIR):
-            for filename in os.listdir(IMAGES_DIR):
-                filepath = os.path.join(IMAGES_DIR, filename)
-                try:
-                    if os.path.isfile(filepath):
-                        os.unlink(filepath)
-                except Exception:
-                    pass
+        _clear_images()
 
         # Logout from Odoo
         odoo_api.logout()
@@ -10,7 +10,6 @@ import secrets
 
 from . import web_bp
 from database.models import VehicleModel, BarrierModel, AccessLogModel, AnprCameraModel, LocationModel, AuditLogModel, BlacklistModel
-import json
 from datetime import date, timedelta
 from services.relay_service import relay_service
 from services.sync_service import sync_service
@@ -203,8 +202,8 @@ def vehicles():
         # Limit per_page to reasonable values
         per_page = min(max(per_page, 10), 100)
 
-        total = VehicleModel.count(search=search if search else None)
-        vehicles = VehicleModel.get_paginated(page=page, per_page=per_page, search=search if search else None)
+        vehicles, total = VehicleModel.get_page_with_total(
+            page=page, per_page=per_page, search=search if search else None)
 
         total_pages = (total + per_page - 1) // per_page  # Ceiling division
 
@@ -244,14 +243,7 @@ def logs():
         # Limit per_page to reasonable values
         per_page = min(max(per_page, 10), 100)
 
-        total = AccessLogModel.count(
-            vehicle_type=vehicle_type if vehicle_type else None,
-            search=search if search else None,
-            date_from=date_from if date_from else None,
-            date_to=date_to if date_to else None,
-            access_granted=access_granted
-        )
-        logs_list = AccessLogModel.get_paginated(
+        logs_list, total = AccessLogModel.get_page_with_total(
             page=page,
             per_page=per_page,
             vehicle_type=vehicle_type if vehicle_type else None,
@@ -293,23 +285,15 @@ def barriers():
 
         # Get ANPR cameras with relay info
         anpr_cameras_raw = AnprCameraModel.get_all()
+        locations = LocationModel.get_by_odoo_ids(
+            {cam['location_id'] for cam in anpr_cameras_raw if cam['location_id']})
         anpr_cameras = []
         for cam in anpr_cameras_raw:
             cam_dict = dict(cam)
-            # Parse relay_channels to list
-            relay_list = []
-            if cam['relay_channels']:
-                try:
-                    relay_list = json.loads(cam['relay_channels'])
-                except:
-                    relay_list = [int(cam['relay_channels'])] if cam['relay_channels'] else []
-            cam_dict['relay_list'] = relay_list
+            cam_dict['relay_list'] = AnprCameraModel.parse_relay_channels(cam['relay_channels'])
             # Get location name
-            if cam['location_id']:
-                loc = LocationModel.get_by_odoo_id(cam['location_id'])
-                cam_dict['location_name'] = loc['name'] if loc else None
-            else:
-                cam_dict['location_name'] = None
+            loc = locations.get(cam['location_id'])
+            cam_dict['location_name'] = loc['name'] if loc else None
             anpr_cameras.append(cam_dict)
 
         return render_template('barriers.html',
@@ -358,14 +342,13 @@ def snapshot_cameras():
         from services.anpr_manager import anpr_manager
 
         cameras_raw = AnprCameraModel.get_all()
+        locations = LocationModel.get_by_odoo_ids(
+            {cam['location_id'] for cam in cameras_raw if cam['location_id']})
         cameras = []
         for cam in cameras_raw:
             cam_dict = dict(cam)
-            if cam['location_id']:
-                loc = LocationModel.get_by_odoo_id(cam['location_id'])
-                cam_dict['location_name'] = loc['name'] if loc else None
-            else:
-                cam_dict['location_name'] = None
+            loc = locations.get(cam['location_id'])
+            cam_dict['location_name'] = loc['name'] if loc else None
             cameras.append(cam_dict)
 
         return render_template('snapshot_cameras.html',
@@ -44,7 +44,7 @@ class AccessService:
         cooldown = DEFAULT_COOLDOWN_SECONDS
         if reg_code:
             try:
-                cam = AnprCameraModel.get_by_reg_code(reg_code)
+                cam = AnprCameraModel.get_by_reg_code_cached(reg_code)
                 if cam and cam['max_valid_detect_seconds']:
                     cooldown = int(cam['max_valid_detect_seconds'])
             except Exception:
@@ -68,7 +68,9 @@ class AccessService:
             plate: str - detected plate number
             camera_ip: str - IP of camera that detected vehicle (optional, for relay mapping)
             plate_images: list - list of {'filename': str, 'data': bytes} for plate images
+                (or 'stream': a binary file object instead of 'data')
             vehicle_images: list - list of {'filename': str, 'data': bytes} for vehicle images
+                (or 'stream', as for plate_images)
             location_id: int - Odoo location ID (from camera's reg_code lookup)
             camera_name: str - Camera name for logging
             plate_image: bytes - (legacy) single plate image data
@@ -141,16 +143,20 @@ class AccessService:
         # Process all plate images
         for i, img in enumerate(plate_images):
             img_data = img.get('data')
+            stream = img.get('stream')
             filename = img.get('filename', f'plate_{i}.jpg')
 
-            if not img_data:
+            if not img_data and stream is None:
                 continue
 
             # Generate UUID for this image
             img_uuid = s3_service.generate_image_uuid('plate')
 
-            # Save locally first
-            local_path = s3_service.save_local(img_data, img_uuid, 'plate')
+            # Save locally first (streams are copied straight to disk and
+            # the S3 upload reads them back from there)
+            local_path = s3_service.save_local(img_data or stream, img_uuid, 'plate')
+            if not local_path:
+                continue
             logger.info(f"Saved plate image: {filename} -> {local_path}")
 
             # Use first image as the main one for Odoo
@@ -166,16 +172,20 @@ class AccessService:
         # Process all vehicle/detection images
         for i, img in enumerate(vehicle_images):
             img_data = img.get('data')
+            stream = img.get('stream')
             filename = img.get('filename', f'vehicle_{i}.jpg')
 
-            if not img_data:
+            if not img_data and stream is None:
                 continue
 
             # Generate UUID for this image
             img_uuid = s3_service.generate_image_uuid('vehicle')
 
-            # Save locally first
-            local_path = s3_service.save_local(img_data, img_uuid, 'vehicle')
+            # Save locally first (streams are copied straight to disk and
+            # the S3 upload reads them back from there)
+            local_path = s3_service.save_local(img_data or stream, img_uuid, 'vehicle')
+            if not local_path:
+                continue
             logger.info(f"Saved vehicle image: {filename} -> {local_path}")
 
             # Use first image as the main one for Odoo
@@ -450,6 +450,7 @@ class RtspBackend(BaseBackend):
         and the full scene. If we don't have a bbox we fall back to one
         image — the full frame.
         """
+        from database.db import db_transaction
         from database.models import AnprCameraModel
         from services.access_service import access_service
         import cv2
@@ -497,8 +498,10 @@ class RtspBackend(BaseBackend):
         if vehicle_bytes and plate_bytes:
             vehicle_images.append({'filename': 'vehicle.jpg', 'data': vehicle_bytes})
 
-        AnprCameraModel.record_capture(camera_id, plate)
-        AnprCameraModel.update_heartbeat_by_id(camera_id)
+        # One commit for both camera updates
+        with db_transaction():
+            AnprCameraModel.record_capture(camera_id, plate)
+            AnprCameraModel.update_heartbeat_by_id(camera_id)
 
         logger.info("RTSP ANPR: camera=%s plate=%s score=%.2f (plate_img=%dB scene_img=%dB)",
                     cam.get('name'), plate, score,
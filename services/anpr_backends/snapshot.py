@@ -90,6 +90,7 @@ class SnapshotBackend(BaseBackend):
                 time.sleep(0.1)
 
     def _poll_once(self, cam):
+        from database.db import db_transaction
         from database.models import AnprCameraModel
         from services.lpr_service import lpr_service
         from services.access_service import access_service
@@ -153,8 +154,10 @@ class SnapshotBackend(BaseBackend):
         else:
             plate_images.append({'filename': 'plate.jpg', 'data': image_bytes})
 
-        AnprCameraModel.record_capture(camera_id, plate)
-        AnprCameraModel.update_heartbeat_by_id(camera_id)
+        # One commit for both camera updates
+        with db_transaction():
+            AnprCameraModel.record_capture(camera_id, plate)
+            AnprCameraModel.update_heartbeat_by_id(camera_id)
 
         logger.info("Snapshot ANPR: camera=%s plate=%s score=%.2f (plate_img=%dB scene_img=%dB)",
                     cam.get('name'), plate, score, len(plate_bytes), len(image_bytes))
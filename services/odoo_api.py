@@ -510,6 +510,30 @@ class OdooAPI:
         Returns:
             int: Created log ID
         """
+        values = self._access_log_values(
+            plate, timestamp, site_id=site_id, plate_image_url=plate_image_url,
+            vehicle_image_url=vehicle_image_url, location_id=location_id,
+            unit_id=unit_id, iu_number=iu_number
+        )
+        return self.create('vehicle.anpr.log', values)
+
+    def create_access_logs(self, logs):
+        """
+        Create several access log entries in one call (create multi)
+
+        Args:
+            logs: list of dicts with create_access_log keyword arguments
+
+        Returns:
+            list: Created log IDs, in input order
+        """
+        values = [self._access_log_values(**log) for log in logs]
+        return self._call_kw('vehicle.anpr.log', 'create', [values])
+
+    def _access_log_values(self, plate, timestamp, site_id=None,
+                           plate_image_url=None, vehicle_image_url=None,
+                           location_id=None, unit_id=None, iu_number=None, **_):
+        """Build vehicle.anpr.log values for create"""
         # site_id is REQUIRED
         if not site_id:
             cfg = self._get_config()
@@ -535,7 +559,7 @@ class OdooAPI:
         if unit_id:
             values['unit_id'] = int(unit_id)
 
-        return self.create('vehicle.anpr.log', values)
+        return values
 
     def get_status(self):
         """Get connection status info"""
@@ -6,6 +6,8 @@ Supports two modes:
 - GPIO: Direct control via Raspberry Pi GPIO pins
 - Web Relay: HTTP control of Iotzone V5+ 8-Channel Ethernet Relay
 """
+import heapq
+import itertools
 import threading
 import time
 import logging
@@ -53,6 +55,19 @@ class RelayService:
         self.relay_names = {i: f"Relay {i}" for i in range(1, 9)}
         self._lock = threading.Lock()
         self._web_relay = None
+        # Leader pin of the lgpio output group holding all relay pins, or
+        # None if the pins were claimed individually
+        self._group_leader = None
+        # Pending pulse OFF events, (deadline, seq, channels), run by one
+        # shared scheduler thread instead of a thread per pulse
+        self._pulse_heap = []
+        self._pulse_seq = itertools.count()
+        self._pulse_until = {}
+        self._pulse_cond = threading.Condition()
+        self._pulse_thread = None
+        # get_all_states() result, rebuilt only after a state or name change.
+        # Replaced, never mutated, so callers may hold on to it read-only.
+        self._states_snapshot = None
 
     def _get_web_relay(self):
         """Lazy load web relay service"""
@@ -88,10 +103,19 @@ class RelayService:
             if self.gpio_handle is None:
                 raise Exception("Could not open any GPIO chip")
 
-            # Setup all pins as output, initially HIGH (relay OFF - active low)
-            for channel, pin in self.RELAY_PINS.items():
-                lgpio.gpio_claim_output(self.gpio_handle, pin, 1)
+            # Setup all pins as output, initially HIGH (relay OFF - active low).
+            # Claimed as one group so all_on/all_off is a single write.
+            pins = list(self.RELAY_PINS.values())
+            try:
+                lgpio.group_claim_output(self.gpio_handle, pins, [1] * len(pins))
+                self._group_leader = pins[0]
+            except Exception as e:
+                logger.warning(f"GPIO group claim failed, using per-pin writes: {e}")
+                for pin in pins:
+                    lgpio.gpio_claim_output(self.gpio_handle, pin, 1)
+            for channel in self.RELAY_PINS:
                 self.relay_states[channel] = False
+            self._states_snapshot = None
 
             logger.info("GPIO initialized successfully")
             return True
@@ -102,8 +126,7 @@ class RelayService:
     def cleanup(self):
         """Cleanup GPIO on exit"""
         if self.gpio_handle and GPIO_AVAILABLE:
-            for pin in self.RELAY_PINS.values():
-                lgpio.gpio_write(self.gpio_handle, pin, 1)  # All OFF
+            self._write_all(False)
             lgpio.gpiochip_close(self.gpio_handle)
             logger.info("GPIO cleanup complete")
 
@@ -131,6 +154,7 @@ class RelayService:
                 lgpio.gpio_write(self.gpio_handle, pin, 0 if state else 1)
 
             self.relay_states[channel] = state
+            self._states_snapshot = None
             logger.info(f"Relay {channel} set to {'ON' if state else 'OFF'}")
             return True
 
@@ -150,26 +174,9 @@ class RelayService:
         if channel not in self.RELAY_PINS:
             return False
 
-        def pulse_thread():
-            # Use GPIO directly for pulse to avoid recursion
-            with self._lock:
-                if GPIO_AVAILABLE and self.gpio_handle:
-                    pin = self.RELAY_PINS[channel]
-                    lgpio.gpio_write(self.gpio_handle, pin, 0)  # ON
-                self.relay_states[channel] = True
-            logger.info(f"Relay {channel} ON")
-
-            time.sleep(duration)
-
-            with self._lock:
-                if GPIO_AVAILABLE and self.gpio_handle:
-                    pin = self.RELAY_PINS[channel]
-                    lgpio.gpio_write(self.gpio_handle, pin, 1)  # OFF
-                self.relay_states[channel] = False
-            logger.info(f"Relay {channel} OFF")
-
-        thread = threading.Thread(target=pulse_thread, daemon=True)
-        thread.start()
+        self._write_relay(channel, True)
+        logger.info(f"Relay {channel} ON")
+        self._schedule_off([channel], duration)
         logger.info(f"Relay {channel} pulsing for {duration}s")
         return True
 
@@ -184,30 +191,58 @@ class RelayService:
         if self._use_web_relay():
             return self._get_web_relay().pulse_multiple(channels, duration)
 
-        def pulse_thread():
-            # Turn all ON
-            for ch in channels:
-                with self._lock:
-                    if GPIO_AVAILABLE and self.gpio_handle and ch in self.RELAY_PINS:
-                        pin = self.RELAY_PINS[ch]
-                        lgpio.gpio_write(self.gpio_handle, pin, 0)
-                    self.relay_states[ch] = True
-
-            time.sleep(duration)
-
-            # Turn all OFF
-            for ch in channels:
-                with self._lock:
-                    if GPIO_AVAILABLE and self.gpio_handle and ch in self.RELAY_PINS:
-                        pin = self.RELAY_PINS[ch]
-                        lgpio.gpio_write(self.gpio_handle, pin, 1)
-                    self.relay_states[ch] = False
-
-        thread = threading.Thread(target=pulse_thread, daemon=True)
-        thread.start()
+        for ch in channels:
+            self._write_relay(ch, True)
+        self._schedule_off(channels, duration)
         logger.info(f"Relays {channels} pulsing for {duration}s")
         return True
 
+    def _write_relay(self, channel, state):
+        """Drive one relay pin and record its state (GPIO only)"""
+        with self._lock:
+            if GPIO_AVAILABLE and self.gpio_handle and channel in self.RELAY_PINS:
+                pin = self.RELAY_PINS[channel]
+                lgpio.gpio_write(self.gpio_handle, pin, 0 if state else 1)
+            self.relay_states[channel] = state
+            self._states_snapshot = None
+
+    def _schedule_off(self, channels, duration):
+        """Queue channels to be switched OFF after duration seconds"""
+        deadline = time.monotonic() + duration
+        with self._pulse_cond:
+            # A newer pulse on a channel extends it rather than being cut
+            # short by an earlier pulse's OFF
+            for ch in channels:
+                self._pulse_until[ch] = max(deadline, self._pulse_until.get(ch, 0))
+            heapq.heappush(self._pulse_heap,
+                           (deadline, next(self._pulse_seq), tuple(channels)))
+            if self._pulse_thread is None:
+                self._pulse_thread = threading.Thread(
+                    target=self._pulse_loop, name='relay-pulse', daemon=True)
+                self._pulse_thread.start()
+            self._pulse_cond.notify()
+
+    def _pulse_loop(self):
+        """Scheduler thread: switch channels OFF as their pulses expire"""
+        while True:
+            with self._pulse_cond:
+                while not self._pulse_heap:
+                    self._pulse_cond.wait()
+                deadline, _, channels = self._pulse_heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._pulse_cond.wait(delay)
+                    continue
+                heapq.heappop(self._pulse_heap)
+                due = [ch for ch in channels
+                       if self._pulse_until.get(ch, 0) <= deadline]
+                for ch in due:
+                    del self._pulse_until[ch]
+
+            for ch in due:
+                self._write_relay(ch, False)
+                logger.info(f"Relay {ch} OFF")
+
     def get_state(self, channel):
         """Get relay state"""
         if self._use_web_relay():
@@ -223,14 +258,19 @@ class RelayService:
                 web_states[ch]["name"] = self.relay_names.get(ch, f"Web Relay {ch}")
             return web_states
 
-        return {
-            ch: {
-                "name": self.relay_names[ch],
-                "state": state,
-                "pin": self.RELAY_PINS[ch]
-            }
-            for ch, state in self.relay_states.items()
-        }
+        snapshot = self._states_snapshot
+        if snapshot is None:
+            with self._lock:
+                snapshot = {
+                    ch: {
+                        "name": self.relay_names[ch],
+                        "state": state,
+                        "pin": self.RELAY_PINS[ch]
+                    }
+                    for ch, state in self.relay_states.items()
+                }
+                self._states_snapshot = snapshot
+        return snapshot
 
     def get_mode(self):
         """Get current relay mode"""
@@ -239,17 +279,45 @@ class RelayService:
     def set_relay_name(self, channel, name):
         """Set custom name for relay"""
         if channel in self.relay_names:
-            self.relay_names[channel] = name
+            with self._lock:
+                self.relay_names[channel] = name
+                self._states_snapshot = None
+
+    def _write_all(self, state):
+        """Drive every relay pin to state, in one write when grouped"""
+        if not (GPIO_AVAILABLE and self.gpio_handle):
+            return
+        # Active LOW: 0 = ON, 1 = OFF
+        level = 0 if state else 1
+        if self._group_leader is not None:
+            mask = (1 << len(self.RELAY_PINS)) - 1
+            lgpio.group_write(self.gpio_handle, self._group_leader,
+                              0 if state else mask, mask)
+        else:
+            for pin in self.RELAY_PINS.values():
+                lgpio.gpio_write(self.gpio_handle, pin, level)
+
+    def _set_all(self, state):
+        """Set every relay to state"""
+        if self._use_web_relay():
+            web_relay = self._get_web_relay()
+            return web_relay.all_on() if state else web_relay.all_off()
+
+        with self._lock:
+            self._write_all(state)
+            for ch in self.RELAY_PINS:
+                self.relay_states[ch] = state
+            self._states_snapshot = None
+        logger.info(f"All relays set to {'ON' if state else 'OFF'}")
+        return True
 
     def all_on(self):
         """Turn all relays ON"""
-        for ch in self.RELAY_PINS:
-            self.set_relay(ch, True)
+        return self._set_all(True)
 
     def all_off(self):
         """Turn all relays OFF"""
-        for ch in self.RELAY_PINS:
-            self.set_relay(ch, False)
+        return self._set_all(False)
 
 
 # Singleton instance
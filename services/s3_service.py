@@ -4,6 +4,7 @@ Handles uploading images to S3-compatible storage
 """
 import os
 import logging
+import shutil
 import threading
 import uuid
 from datetime import datetime
@@ -133,12 +134,13 @@ class S3Service:
         Save image locally
 
         Args:
-            image_data: bytes - image content
+            image_data: bytes or binary file object - image content
             image_uuid: str - unique identifier
             image_type: str - 'plate' or 'vehicle'
 
         Returns:
-            str: Local file path relative to IMAGES_DIR
+            str: Local file path relative to IMAGES_DIR, or None if a file
+                 object turned out to be empty
         """
         from config import IMAGES_DIR
 
@@ -152,7 +154,15 @@ class S3Service:
         filepath = os.path.join(full_dir, filename)
 
         with open(filepath, 'wb') as f:
-            f.write(image_data)
+            if hasattr(image_data, 'read'):
+                # Upload streams are copied in chunks, never held as bytes
+                shutil.copyfileobj(image_data, f)
+                size = f.tell()
+            else:
+                size = f.write(image_data)
+        if not size:
+            os.remove(filepath)
+            return None
 
         # Return relative path
         return os.path.join(date_dir, image_type, filename)
@@ -209,7 +219,7 @@ class S3Service:
         Upload image to S3 in background thread
 
         Args:
-            image_data: bytes - image content
+            image_data: bytes - image content, or None to read it from local_path
             image_uuid: str - unique identifier
             image_type: str - 'plate' or 'vehicle'
             local_path: str - local file path to delete after successful upload
@@ -218,6 +228,15 @@ class S3Service:
             return
 
         def upload_thread():
+            nonlocal image_data
+            if image_data is None:
+                from config import IMAGES_DIR
+                try:
+                    with open(os.path.join(IMAGES_DIR, local_path), 'rb') as f:
+                        image_data = f.read()
+                except OSError as e:
+                    logger.error(f"Cannot read {local_path} for S3 upload: {e}")
+                    return
             success, result = self.upload_to_s3(image_data, image_uuid, image_type)
             if success:
                 # Delete local file after successful S3 upload
@@ -304,21 +323,27 @@ class S3Service:
         import base64
 
         pending = UploadQueueModel.get_pending('s3_image', limit=10)
-        for item in pending:
-            try:
-                payload = json.loads(item['payload'])
-                image_data = base64.b64decode(payload['image_data_b64'])
-                success, result = self.upload_to_s3(
-                    image_data,
-                    payload['image_uuid'],
-                    payload['image_type']
-                )
-                if success:
-                    UploadQueueModel.mark_completed(item['id'])
-                else:
-                    UploadQueueModel.mark_failed(item['id'], result)
-            except Exception as e:
-                UploadQueueModel.mark_failed(item['id'], str(e))
+        failed = []
+        try:
+            for item in pending:
+                try:
+                    payload = json.loads(item['payload'])
+                    image_data = base64.b64decode(payload['image_data_b64'])
+                    success, result = self.upload_to_s3(
+                        image_data,
+                        payload['image_uuid'],
+                        payload['image_type']
+                    )
+                    if success:
+                        UploadQueueModel.mark_completed(item['id'])
+                    else:
+                        failed.append((item['id'], result))
+                except Exception as e:
+                    failed.append((item['id'], str(e)))
+        finally:
+            # One commit for all failed attempts in this pass
+            if failed:
+                UploadQueueModel.mark_failed_many(failed)
 
     def get_status(self):
         """Get S3 service status"""
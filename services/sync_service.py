@@ -10,6 +10,17 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Queued Odoo logs sent per create call
+QUEUE_BATCH_SIZE = 50
+
+# Seconds to wait after an item lands in the upload queue before retrying
+# it (the push that queued it has just failed)
+QUEUE_RETRY_DELAY = 60
+
+# Seconds get_status() reuses its table counts; several pages and the
+# websocket status loop poll it
+STATUS_COUNTS_TTL = 1.0
+
 
 class SyncService:
     """Service for syncing data with Odoo"""
@@ -30,6 +41,8 @@ class SyncService:
         self._running = False
         self.last_sync = None
         self.last_error = None
+        self._status_counts = None
+        self._status_counts_expires = 0.0
 
     def _get_config(self):
         """Get current config"""
@@ -188,7 +201,7 @@ class SyncService:
 
         return results
 
-    def push_access_log(self, log_data):
+    def push_access_log(self, log_data, queue_on_failure=True):
         """Push access log to Odoo (vehicle.anpr.log)"""
         try:
             api = self._get_api()
@@ -215,8 +228,9 @@ class SyncService:
         except Exception as e:
             logger.error(f"Failed to push access log: {e}")
             # Queue for retry
-            from database.models import UploadQueueModel
-            UploadQueueModel.add('odoo_log', log_data)
+            if queue_on_failure:
+                from database.models import UploadQueueModel
+                UploadQueueModel.add('odoo_log', log_data)
             raise
 
     def push_access_log_async(self, log_id, plate, camera_ip, access_granted, vehicle_type,
@@ -273,7 +287,9 @@ class SyncService:
         from database.models import UploadQueueModel, AnprCameraModel
 
         # Process Odoo logs
-        pending = UploadQueueModel.get_pending('odoo_log', limit=20)
+        pending = UploadQueueModel.get_pending('odoo_log', limit=QUEUE_BATCH_SIZE)
+        batch = []
+        failed = []
         for item in pending:
             try:
                 payload = json.loads(item['payload'])
@@ -298,10 +314,39 @@ class SyncService:
                             payload['site_id'] = camera['site_id']
                             logger.info(f"Queue: Using site_id {payload['site_id']} from ANPR camera")
 
-                self.push_access_log(payload)
-                UploadQueueModel.mark_completed(item['id'])
+                batch.append((item['id'], payload))
             except Exception as e:
-                UploadQueueModel.mark_failed(item['id'], e)
+                failed.append((item['id'], e))
+
+        if failed:
+            UploadQueueModel.mark_failed_many(failed)
+            failed = []
+        if not batch:
+            return
+
+        # One create call for the whole batch; if Odoo rejects it, retry item
+        # by item so a single bad payload doesn't hold back the rest
+        try:
+            self._get_api().create_access_logs([payload for _, payload in batch])
+        except Exception as e:
+            logger.warning(f"Batch push of {len(batch)} queued logs failed, retrying individually: {e}")
+        else:
+            UploadQueueModel.mark_completed_many(queue_id for queue_id, _ in batch)
+            logger.info(f"Pushed {len(batch)} queued access logs to Odoo")
+            return
+
+        # Successes are removed one by one, so a crash mid-batch can't lead
+        # to pushing them twice; failures are recorded together at the end
+        try:
+            for queue_id, payload in batch:
+                try:
+                    self.push_access_log(payload, queue_on_failure=False)
+                    UploadQueueModel.mark_completed(queue_id)
+                except Exception as e:
+                    failed.append((queue_id, e))
+        finally:
+            if failed:
+                UploadQueueModel.mark_failed_many(failed)
 
     def start_sync_loop(self, interval=None):
         """Start background sync loop"""
@@ -318,30 +363,53 @@ class SyncService:
         self._running = True
 
         def sync_loop():
+            from database.models import UploadQueueModel
+
             cfg = self._get_config()
             sync_interval = interval or cfg.sync_interval
+            # Set when a log is queued for retry (and to wake us on stop)
+            queue_event = UploadQueueModel.item_added
+            queue_dirty = False
 
             # Initial delay before first sync
-            time.sleep(10)
+            now = time.monotonic()
+            next_sync = now + 10
+            next_queue = now
 
             while self._running:
+                now = time.monotonic()
                 try:
-                    # Sync all data (locations, ANPR cameras, vehicles)
-                    results = self.sync_all()
-                    if results['errors']:
-                        logger.warning(f"Sync completed with errors: {results['errors']}")
-
-                    # Process queue
-                    self.process_queue()
+                    if now >= next_sync:
+                        # Reschedule first, so a failure below can't leave
+                        # the deadline in the past and spin the loop
+                        next_sync = now + sync_interval
+                        queue_dirty = False
+
+                        # Sync all data (locations, ANPR cameras, vehicles)
+                        results = self.sync_all()
+                        if results['errors']:
+                            logger.warning(f"Sync completed with errors: {results['errors']}")
+
+                        # Process queue
+                        self.process_queue()
+                    elif queue_dirty and now >= next_queue:
+                        queue_dirty = False
+                        self.process_queue()
 
                 except Exception as e:
                     logger.error(f"Sync loop error: {e}")
-
-                # Wait for next sync
-                for _ in range(sync_interval):
-                    if not self._running:
-                        break
-                    time.sleep(1)
+                    # Whatever is still queued gets another go after the
+                    # retry delay, not immediately
+                    queue_dirty = True
+                    next_queue = time.monotonic() + QUEUE_RETRY_DELAY
+
+                # Sleep until the next sync, or until a queued item is due
+                deadline = min(next_sync, next_queue) if queue_dirty else next_sync
+                if queue_event.wait(max(0, deadline - time.monotonic())):
+                    queue_event.clear()
+                    if self._running and not queue_dirty:
+                        queue_dirty = True
+                        next_queue = time.monotonic() + QUEUE_RETRY_DELAY
 
         self._sync_thread = threading.Thread(target=sync_loop, daemon=True)
         self._sync_thread.start()
@@ -349,7 +417,10 @@ class SyncService:
 
     def stop_sync_loop(self):
         """Stop background sync loop"""
+        from database.models import UploadQueueModel
+
         self._running = False
+        UploadQueueModel.item_added.set()  # wake the loop
         if self._sync_thread:
             self._sync_thread.join(timeout=5)
         logger.info("Sync loop stopped")
@@ -367,9 +438,22 @@ class SyncService:
         thread = threading.Thread(target=sync_thread, daemon=True)
         thread.start()
 
+    def _get_status_counts(self):
+        """Table counts for get_status(), refreshed at most every STATUS_COUNTS_TTL"""
+        from database.models import VehicleModel, LocationModel, AnprCameraModel, UploadQueueModel
+        now = time.monotonic()
+        if self._status_counts is None or now >= self._status_counts_expires:
+            self._status_counts = {
+                'vehicles_count': VehicleModel.count(),
+                'locations_count': LocationModel.count(),
+                'anpr_cameras_count': AnprCameraModel.count(),
+                'queue_pending': UploadQueueModel.count_pending()
+            }
+            self._status_counts_expires = now + STATUS_COUNTS_TTL
+        return self._status_counts
+
     def get_status(self):
         """Get sync status"""
-        from database.models import VehicleModel, LocationModel, AnprCameraModel, UploadQueueModel
         api = self._get_api()
 
         return {
@@ -378,10 +462,7 @@ class SyncService:
             'odoo_username': api._username or '',
             'last_sync': self.last_sync.isoformat() if self.last_sync else None,
             'last_error': self.last_error,
-            'vehicles_count': VehicleModel.count(),
-            'locations_count': LocationModel.count(),
-            'anpr_cameras_count': AnprCameraModel.count(),
-            'queue_pending': UploadQueueModel.count_pending()
+            **self._get_status_counts()
         }
 
 
@@ -41,13 +41,14 @@ class WebSocketService:
         self._loop = None
         self._thread = None
         self._running = False
-        self._message_queue = []
+        self._stop_event = None
         self._stats_interval = 30  # seconds
         # Camera subscriptions: {websocket: {reg_code: filter}}
         # filter: 'all' | 'unregistered' | 'registered' | 'none'
         self._camera_subscriptions = {}
-        # Camera-specific message queue: [(reg_code, message, event_data), ...]
-        self._camera_queue = []
+        # Reverse index (rooms): {reg_code: {websocket: filter}} so a camera
+        # event only visits the clients subscribed to that camera
+        self._camera_rooms = {}
 
     async def _handler(self, websocket, path=None):
         """Handle WebSocket connections"""
@@ -70,12 +71,32 @@ class WebSocketService:
         except websockets.exceptions.ConnectionClosed:
             pass
         finally:
-            self.clients.discard(websocket)
-            # Clean up camera subscriptions
-            if websocket in self._camera_subscriptions:
-                del self._camera_subscriptions[websocket]
+            self._drop_client(websocket)
             logger.info(f"WebSocket client disconnected: {client_ip} (total: {len(self.clients)})")
 
+    def _subscribe(self, websocket, camera, filter_type):
+        """Add a camera subscription to both indexes"""
+        self._camera_subscriptions.setdefault(websocket, {})[camera] = filter_type
+        self._camera_rooms.setdefault(camera, {})[websocket] = filter_type
+
+    def _unsubscribe(self, websocket, camera):
+        """Remove a camera subscription from both indexes"""
+        subs = self._camera_subscriptions.get(websocket)
+        if subs is not None:
+            subs.pop(camera, None)
+        room = self._camera_rooms.get(camera)
+        if room is not None:
+            room.pop(websocket, None)
+            if not room:
+                del self._camera_rooms[camera]
+
+    def _drop_client(self, websocket):
+        """Forget a disconnected client and all its subscriptions"""
+        self.clients.discard(websocket)
+        for camera in list(self._camera_subscriptions.get(websocket, ())):
+            self._unsubscribe(websocket, camera)
+        self._camera_subscriptions.pop(websocket, None)
+
     async def _handle_message(self, websocket, data):
         """Handle incoming WebSocket messages"""
         msg_type = data.get('type')
@@ -95,9 +116,7 @@ class WebSocketService:
             camera = data.get('camera')  # reg_code
             filter_type = data.get('filter', 'all')  # all, unregistered, registered, none
             if camera:
-                if websocket not in self._camera_subscriptions:
-                    self._camera_subscriptions[websocket] = {}
-                self._camera_subscriptions[websocket][camera] = filter_type
+                self._subscribe(websocket, camera, filter_type)
                 client_ip = websocket.remote_address[0] if websocket.remote_address else 'unknown'
                 await websocket.send(json.dumps({
                     'type': 'subscribed',
@@ -110,7 +129,7 @@ class WebSocketService:
         elif action == 'unsubscribe':
             camera = data.get('camera')
             if camera and websocket in self._camera_subscriptions:
-                self._camera_subscriptions[websocket].pop(camera, None)
+                self._unsubscribe(websocket, camera)
                 await websocket.send(json.dumps({
                     'type': 'unsubscribed',
                     'camera': camera,
@@ -123,10 +142,9 @@ class WebSocketService:
             from database.models import AnprCameraModel
             cameras = AnprCameraModel.get_all()
             filter_type = data.get('filter', 'all')
-            if websocket not in self._camera_subscriptions:
-                self._camera_subscriptions[websocket] = {}
+            self._camera_subscriptions.setdefault(websocket, {})
             for cam in cameras:
-                self._camera_subscriptions[websocket][cam['reg_code']] = filter_type
+                self._subscribe(websocket, cam['reg_code'], filter_type)
             await websocket.send(json.dumps({
                 'type': 'subscribed_all',
                 'filter': filter_type,
@@ -174,10 +192,15 @@ class WebSocketService:
             except Exception:
                 dead_clients.add(client)
 
-        self.clients -= dead_clients
+        for client in dead_clients:
+            self._drop_client(client)
 
     async def _broadcast_to_camera(self, reg_code, message, event_data=None):
         """Broadcast message to clients subscribed to a specific camera with filtering"""
+        room = self._camera_rooms.get(reg_code)
+        if not room:
+            return
+
         msg_str = json.dumps(message) if isinstance(message, dict) else message
 
         # Get access_granted from event data for filtering
@@ -186,43 +209,34 @@ class WebSocketService:
             access_granted = event_data.get('access_granted')
 
         dead_clients = set()
-        logger.info(f"Broadcasting to camera {reg_code}, {len(self._camera_subscriptions)} clients with subscriptions")
-        for client, subscriptions in list(self._camera_subscriptions.items()):
-            client_ip = client.remote_address[0] if client.remote_address else 'unknown'
-            logger.info(f"  Client {client_ip} subscriptions: {list(subscriptions.keys())}")
-            if reg_code in subscriptions:
-                filter_type = subscriptions[reg_code]
-
-                # Apply filter logic
+        sent = 0
+        for client, filter_type in list(room.items()):
+            # Apply filter logic
+            should_send = False
+            if filter_type == 'all':
+                should_send = True
+            elif filter_type == 'none':
                 should_send = False
-                if filter_type == 'all':
-                    should_send = True
-                elif filter_type == 'none':
-                    should_send = False
-                elif filter_type == 'unregistered' and access_granted is not None:
-                    should_send = not access_granted  # Only send if NOT registered
-                elif filter_type == 'registered' and access_granted is not None:
-                    should_send = access_granted  # Only send if registered
-                else:
-                    # Default: send if no filter or unknown filter
-                    should_send = True
-
-                if should_send:
-                    try:
-                        await client.send(msg_str)
-                        client_ip = client.remote_address[0] if client.remote_address else 'unknown'
-                        logger.info(f"Sent event to {client_ip} (camera: {reg_code}, filter: {filter_type})")
-                    except Exception:
-                        dead_clients.add(client)
-                else:
-                    client_ip = client.remote_address[0] if client.remote_address else 'unknown'
-                    logger.info(f"Filtered event for {client_ip} (camera: {reg_code}, filter: {filter_type}, access: {access_granted})")
+            elif filter_type == 'unregistered' and access_granted is not None:
+                should_send = not access_granted  # Only send if NOT registered
+            elif filter_type == 'registered' and access_granted is not None:
+                should_send = access_granted  # Only send if registered
+            else:
+                # Default: send if no filter or unknown filter
+                should_send = True
+
+            if should_send:
+                try:
+                    await client.send(msg_str)
+                    sent += 1
+                except Exception:
+                    dead_clients.add(client)
+
+        logger.debug(f"Camera {reg_code} event sent to {sent}/{len(room)} subscribers")
 
         # Clean up dead clients
         for client in dead_clients:
-            self.clients.discard(client)
-            if client in self._camera_subscriptions:
-                del self._camera_subscriptions[client]
+            self._drop_client(client)
 
     async def _stats_loop(self):
         """Periodically broadcast stats"""
@@ -242,6 +256,7 @@ class WebSocketService:
 
     async def _run_server(self, host, port):
         """Run the WebSocket server"""
+        self._stop_event = asyncio.Event()
         self._running = True
 
         async with serve(self._handler, host, port):
@@ -250,27 +265,23 @@ class WebSocketService:
             # Start stats loop
             stats_task = asyncio.create_task(self._stats_loop())
 
-            # Process queued messages
-            while self._running:
-                # Broadcast to all clients
-                while self._message_queue:
-                    message = self._message_queue.pop(0)
-                    await self._broadcast(message)
-
-                # Broadcast to camera subscribers
-                while self._camera_queue:
-                    item = self._camera_queue.pop(0)
-                    if len(item) == 3:
-                        reg_code, message, event_data = item
-                    else:
-                        reg_code, message = item
-                        event_data = None
-                    await self._broadcast_to_camera(reg_code, message, event_data)
-
-                await asyncio.sleep(0.1)
+            # Broadcasts are scheduled onto this loop by _dispatch(); just
+            # wait here until stop() is called
+            await self._stop_event.wait()
 
             stats_task.cancel()
 
+    def _dispatch(self, coro_fn, *args):
+        """Schedule a broadcast coroutine on the server loop from any thread"""
+        loop = self._loop
+        if not self._running or loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(coro_fn(*args), loop)
+        except RuntimeError:
+            # Loop shut down between the check and the call
+            pass
+
     def start(self, host='0.0.0.0', port=8081):
         """Start WebSocket server in background thread"""
         if not WS_AVAILABLE:
@@ -296,6 +307,11 @@ class WebSocketService:
     def stop(self):
         """Stop WebSocket server"""
         self._running = False
+        if self._loop and self._stop_event and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass
         if self._thread:
             self._thread.join(timeout=5)
         logger.info("WebSocket server stopped")
@@ -311,7 +327,7 @@ class WebSocketService:
             'type': 'access_event',
             'data': event_data
         }
-        self._message_queue.append(message)
+        self._dispatch(self._broadcast, message)
         logger.debug(f"Queued access event broadcast: {event_data.get('plate')}")
 
     def broadcast_camera_event(self, reg_code, event_data):
@@ -329,7 +345,7 @@ class WebSocketService:
             'data': event_data
         }
         # Include event_data for filter checking
-        self._camera_queue.append((reg_code, message, event_data))
+        self._dispatch(self._broadcast_to_camera, reg_code, message, event_data)
         logger.info(f"Queued camera event for {reg_code}: {event_data.get('plate')} (access_granted: {event_data.get('access_granted')})")
 
     def broadcast_barrier_status(self, relay_states):
@@ -338,7 +354,7 @@ class WebSocketService:
             'type': 'barrier_status',
             'data': {'relays': relay_states}
         }
-        self._message_queue.append(message)
+        self._dispatch(self._broadcast, message)
 
     def broadcast_system_status(self):
         """Broadcast system status update"""
@@ -348,7 +364,7 @@ class WebSocketService:
             'type': 'system_status',
             'data': status
         }
-        self._message_queue.append(message)
+        self._dispatch(self._broadcast, message)
 
     def get_client_count(self):
         """Get number of connected clients"""
@@ -24,7 +24,7 @@ apt install -y python3-pip python3-lgpio python3-flask
 
 # Install Python packages
 echo "[3/6] Installing Python packages..."
-pip3 install websockets boto3 requests --break-system-packages
+pip3 install websockets boto3 requests waitress orjson lxml --break-system-packages
 
 # Create data directories
 echo "[4/6] Creating data directories..."
@@ -37,6 +37,12 @@ chmod +x app.py
 
 # Install systemd service
 echo "[6/8] Installing systemd service..."
+# The standalone relay controller is superseded by PiBox (same port, same
+# GPIO pins, legacy /api/relay endpoints included) - retire it if present
+if systemctl list-unit-files relay-controller.service >/dev/null 2>&1; then
+    systemctl disable --now relay-controller || true
+    rm -f /etc/systemd/system/relay-controller.service
+fi
 cp pibox.service /etc/systemd/system/
 systemctl daemon-reload
 systemctl enable pibox